@@ -1,30 +1,77 @@
 import logging
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
 
-from .const import DOMAIN
+from .const import DOMAIN, CONF_HOST, CONF_USERNAME, CONF_PASSWORD, CONF_API_KEY, CONF_ENDPOINT_ID, PLATFORMS
+from .services import async_setup_services
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = ["sensor", "binary_sensor", "switch", "button"]
-
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up HA Portainer Link from YAML."""
+    await async_setup_services(hass)
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up HA Portainer Link from a config entry."""
-    hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = entry.data
+    # Imported here so discovery doesn't pull in aiohttp and the coordinator helpers
+    from homeassistant.helpers.aiohttp_client import async_get_clientsession
+    from .coordinator import PortainerDataUpdateCoordinator
+    from .portainer_api import PortainerAPI
+
+    endpoint_id = entry.data[CONF_ENDPOINT_ID]
+
+    # One API client per entry, shared by all platforms, on top of HA's pooled HTTP session.
+    # Every request already passes ssl=False, so use the non-verifying shared session.
+    api = PortainerAPI(
+        entry.data[CONF_HOST],
+        entry.data.get(CONF_USERNAME),
+        entry.data.get(CONF_PASSWORD),
+        entry.data.get(CONF_API_KEY),
+        session=async_get_clientsession(hass, verify_ssl=False),
+    )
+    if not await api.initialize():
+        await api.close()
+        raise ConfigEntryNotReady(f"Could not authenticate with Portainer at {entry.data[CONF_HOST]}")
+
+    # Options override the setup data; merge in one step, and skip the copy when there are none
+    config = entry.data | entry.options if entry.options else entry.data
+
+    # All platforms read from this coordinator instead of polling Portainer per entity
+    coordinator = PortainerDataUpdateCoordinator(hass, api, endpoint_id, config)
+    try:
+        await coordinator.async_config_entry_first_refresh()
+    except ConfigEntryNotReady:
+        await api.close()
+        raise
+
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
+        "api": api,
+        "coordinator": coordinator,
+        "endpoint_id": endpoint_id,
+    }
+
+    # Feature toggles are read once by the coordinator, so reload the entry when it changes
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
     # ✅ Richtiger Aufruf!
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry after its data or options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload the config entry and its platforms."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id, None)
+        domain_data = hass.data.get(DOMAIN, {})
+        entry_data = domain_data.pop(entry.entry_id, None)
+        if entry_data is not None:
+            await entry_data["api"].close()
+        if not domain_data:
+            hass.data.pop(DOMAIN, None)
     return unload_ok
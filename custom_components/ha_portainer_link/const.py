@@ -5,3 +5,21 @@ CONF_USERNAME = "username"
 CONF_PASSWORD = "password"
 CONF_API_KEY = "api_key"
 CONF_ENDPOINT_ID = "endpoint_id"
+
+PLATFORMS = ("sensor", "binary_sensor", "switch", "button")
+
+# Refresh tiers (seconds): container state is fetched on every coordinator tick,
+# slower-changing data is cached between ticks
+UPDATE_CHECK_INTERVAL = 300
+IMAGE_DATA_INTERVAL = 1800
+
+# After recreating a container, poll it this often (seconds) until it runs the new image,
+# giving up after the timeout and refreshing anyway
+POST_ACTION_POLL_INTERVAL = 1
+POST_ACTION_TIMEOUT = 30
+
+# Upper bounds on parallel Portainer requests
+UPDATE_CHECK_CONCURRENCY = 8  # registry update checks per refresh
+METRICS_CONCURRENCY = 4  # stats/inspect calls per refresh
+IMAGE_DATA_CONCURRENCY = 4  # image metadata lookups per refresh
+STACK_ACTION_CONCURRENCY = 8  # per-container start/stop calls of a stack action
@@ -2,6 +2,7 @@ import logging
 import aiohttp
 from typing import List, Dict, Any, Optional
 from aiohttp.client_exceptions import ClientConnectorCertificateError
+from homeassistant.util.json import json_loads
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -36,22 +37,14 @@ class PortainerContainerAPI:
             _LOGGER.error("❌ Failed to check endpoint %s: HTTP %s", endpoint_id, resp.status)
             return False
 
-    async def get_available_endpoints(self) -> List[Dict[str, Any]]:
-        url = f"{self.base_url}/api/endpoints"
-        async with await self._request("GET", url) as resp:
-            if resp.status != 200:
-                _LOGGER.error("❌ Could not list endpoints: HTTP %s", resp.status)
-                return []
-            return await resp.json()
-
     async def get_containers(self, endpoint_id: int) -> Optional[List[Dict[str, Any]]]:
         """Return containers or **None** on non-200 (so init can fail fast)."""
         url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/json?all=1"
-        _LOGGER.info("🔍 Getting containers from URL: %s", url)
+        _LOGGER.debug("🔍 Getting containers from URL: %s", url)
         async with await self._request("GET", url) as resp:
             if resp.status == 200:
-                containers = await resp.json()
-                _LOGGER.info("✅ Got %d containers from endpoint %s", len(containers), endpoint_id)
+                containers = await resp.json(loads=json_loads)
+                _LOGGER.debug("✅ Got %d containers from endpoint %s", len(containers), endpoint_id)
                 return containers
             if resp.status == 404:
                 _LOGGER.error("❌ Endpoint %s not found (404)", endpoint_id)
@@ -66,7 +59,7 @@ class PortainerContainerAPI:
         url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}/json"
         async with await self._request("GET", url) as resp:
             if resp.status == 200:
-                return await resp.json()
+                return await resp.json(loads=json_loads)
             _LOGGER.error("❌ Failed to inspect container %s: HTTP %s", container_id, resp.status)
             return None
 
@@ -74,7 +67,7 @@ class PortainerContainerAPI:
         url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}/stats?stream=false"
         async with await self._request("GET", url) as resp:
             if resp.status == 200:
-                return await resp.json()
+                return await resp.json(loads=json_loads)
             _LOGGER.error("❌ Failed to get container stats: HTTP %s", resp.status)
             return None
 
@@ -119,7 +112,7 @@ class PortainerContainerAPI:
                 session = self.session or self.auth.session
                 async with session.get(url, headers=self.auth.get_headers(), ssl=self.ssl_verify) as resp:
                     if resp.status == 200:
-                        endpoints = await resp.json()
+                        endpoints = await resp.json(loads=json_loads)
                         _LOGGER.info("✅ Found %d available endpoints:", len(endpoints))
                         for endpoint in endpoints:
                             endpoint_id = endpoint.get("Id")
@@ -140,7 +133,7 @@ class PortainerContainerAPI:
                             _LOGGER.info("✅ Successfully connected with SSL disabled")
                             # Update SSL setting for future calls
                             self.ssl_verify = False
-                            endpoints = await resp.json()
+                            endpoints = await resp.json(loads=json_loads)
                             _LOGGER.info("✅ Found %d available endpoints:", len(endpoints))
                             for endpoint in endpoints:
                                 endpoint_id = endpoint.get("Id")
@@ -164,16 +157,16 @@ class PortainerContainerAPI:
         url = f"{self.base_url}/api/endpoints/{endpoint_id}"
         
         try:
-            _LOGGER.info("🔍 Checking if endpoint %s exists: %s", endpoint_id, url)
+            _LOGGER.debug("🔍 Checking if endpoint %s exists: %s", endpoint_id, url)
             
             # Try with current SSL setting first
             try:
                 session = self.session or self.auth.session
                 async with session.get(url, headers=self.auth.get_headers(), ssl=self.ssl_verify) as resp:
                     if resp.status == 200:
-                        endpoint_data = await resp.json()
+                        endpoint_data = await resp.json(loads=json_loads)
                         endpoint_name = endpoint_data.get("Name", "Unknown")
-                        _LOGGER.info("✅ Endpoint %s exists: %s", endpoint_id, endpoint_name)
+                        _LOGGER.debug("✅ Endpoint %s exists: %s", endpoint_id, endpoint_name)
                         return True
                     elif resp.status == 404:
                         _LOGGER.error("❌ Endpoint %s does not exist (404)", endpoint_id)
@@ -191,9 +184,9 @@ class PortainerContainerAPI:
                             _LOGGER.info("✅ Successfully connected with SSL disabled")
                             # Update SSL setting for future calls
                             self.ssl_verify = False
-                            endpoint_data = await resp.json()
+                            endpoint_data = await resp.json(loads=json_loads)
                             endpoint_name = endpoint_data.get("Name", "Unknown")
-                            _LOGGER.info("✅ Endpoint %s exists: %s", endpoint_id, endpoint_name)
+                            _LOGGER.debug("✅ Endpoint %s exists: %s", endpoint_id, endpoint_name)
                             return True
                         elif resp.status == 404:
                             _LOGGER.error("❌ Endpoint %s does not exist (404) even with SSL disabled", endpoint_id)
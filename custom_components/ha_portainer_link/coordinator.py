@@ -1,18 +1,57 @@
 import logging
-from datetime import timedelta
-from typing import Dict, List, Optional, Any
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 import asyncio
+import time
 
+from .const import (
+    DOMAIN,
+    UPDATE_CHECK_INTERVAL,
+    IMAGE_DATA_INTERVAL,
+    POST_ACTION_POLL_INTERVAL,
+    POST_ACTION_TIMEOUT,
+    UPDATE_CHECK_CONCURRENCY,
+    METRICS_CONCURRENCY,
+    IMAGE_DATA_CONCURRENCY,
+)
 from .portainer_api import PortainerAPI
 
 _LOGGER = logging.getLogger(__name__)
 
+# Shared, read-only stack info for every container that is not part of a stack
+_EMPTY_STACK_INFO: Mapping[str, Any] = MappingProxyType({
+    "stack_name": None,
+    "service_name": None,
+    "container_number": None,
+    "is_stack_container": False,
+})
+
+def _container_display_name(container: Dict[str, Any]) -> str:
+    """Return the container's primary name without Docker's leading "/"."""
+    names = container.get("Names")
+    return names[0].lstrip("/") if names else "unknown"
+
+@dataclass(slots=True)
+class NormalizedContainer:
+    """Container fields pre-processed once per refresh for entity setup and lookups."""
+
+    id: str
+    name: str
+    image: Optional[str]
+    state: Any
+    running: bool
+    stack_info: Mapping[str, Any]
+    stable_id: str  # survives container recreation; see stable_container_map
+
 class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
     """Coordinator for Portainer data updates."""
 
-    def __init__(self, hass: HomeAssistant, api: PortainerAPI, endpoint_id: int, config: Dict[str, Any]):
+    def __init__(self, hass: HomeAssistant, api: PortainerAPI, endpoint_id: int, config: Mapping[str, Any]):
         """Initialize the coordinator."""
         # Get update interval from config
         update_interval = config.get("update_interval", 5)
@@ -27,22 +66,48 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
         self.endpoint_id = endpoint_id
         self.config = config
         self.containers: Dict[str, Dict[str, Any]] = {}
+        self.container_list: List[NormalizedContainer] = []  # pre-processed container fields
         self.stacks: Dict[str, Dict[str, Any]] = {}
         self.container_stack_map: Dict[str, str] = {}  # container_id -> stack_name
-        self.container_stack_info: Dict[str, Dict[str, Any]] = {}  # container_id -> detailed stack info
+        self.container_stack_info: Dict[str, Mapping[str, Any]] = {}  # container_id -> detailed stack info
         self.update_availability: Dict[str, bool] = {}  # container_id -> has_updates
         self.stable_container_map: Dict[str, str] = {}  # stable_id -> container_id
         self.metrics: Dict[str, Dict[str, Any]] = {}  # container_id -> {cpu_percent, memory_mb, uptime_s}
         self.image_data: Dict[str, Dict[str, Any]] = {}  # container_id -> image metadata
 
+        # Feature toggles are fixed for the lifetime of the entry (a config change reloads it),
+        # so resolve them once instead of on every refresh and per container
+        self.stack_view_enabled = bool(config.get("enable_stack_view", True))
+        self.resource_sensors_enabled = bool(config.get("enable_resource_sensors", True))
+        self.version_sensors_enabled = bool(config.get("enable_version_sensors", True))
+        self.update_sensors_enabled = bool(config.get("enable_update_sensors", True))
+        self.stack_buttons_enabled = bool(config.get("enable_stack_buttons", True))
+        self.container_buttons_enabled = bool(config.get("enable_container_buttons", True))
+        self._last_image_refresh = 0.0
+        self._last_update_check = 0.0
+        # stable_id -> entities that follow that container across recreation (see register_container_entity)
+        self._container_entities: Dict[str, set] = defaultdict(set)
+        # container_id -> inspect result, shared by the metrics and image passes of one refresh
+        self._inspect_cache: Dict[str, Dict[str, Any]] = {}
+
     async def _async_update_data(self) -> Dict[str, Any]:
         """Update container and stack data."""
         try:
             _LOGGER.debug("🔄 Updating Portainer data for endpoint %s", self.endpoint_id)
             
-            # First, check if the endpoint exists
-            endpoint_exists = await self.api.containers.check_endpoint_exists(self.endpoint_id)
-            if not endpoint_exists:
+            # Renew the login before it expires instead of failing a refresh with 401s
+            await self.api.ensure_authenticated()
+
+            # Check the endpoint and fetch containers and stacks in one parallel burst
+            stack_view = self.stack_view_enabled
+            endpoint_exists, containers, stacks = await asyncio.gather(
+                self.api.containers.check_endpoint_exists(self.endpoint_id),
+                self.api.get_containers(self.endpoint_id),
+                self.api.get_stacks(self.endpoint_id) if stack_view else asyncio.sleep(0, result=[]),
+                return_exceptions=True,
+            )
+
+            if endpoint_exists is False:
                 _LOGGER.error("❌ Endpoint %s does not exist. Getting available endpoints...", self.endpoint_id)
                 available_endpoints = await self.api.containers.get_available_endpoints()
                 if available_endpoints:
@@ -54,16 +119,16 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                     "stacks": [],
                     "container_stack_map": {}
                 }
-            
-            # Get containers and stacks in parallel
-            containers_task = self.api.get_containers(self.endpoint_id)
-            stacks_task = self.api.get_stacks(self.endpoint_id) if self.is_stack_view_enabled() else asyncio.sleep(0, result=[])
-            
-            if self.is_stack_view_enabled():
-                containers, stacks = await asyncio.gather(containers_task, stacks_task)
-            else:
-                containers = await containers_task
-                stacks = []
+            if isinstance(endpoint_exists, Exception):
+                _LOGGER.debug("⚠️ Endpoint check failed, continuing with container data: %s", endpoint_exists)
+
+            # Fall back to the previous refresh's data if a single call failed
+            if isinstance(containers, Exception):
+                _LOGGER.warning("⚠️ Failed to fetch containers, keeping previous data: %s", containers)
+                containers = list(self.containers.values())
+            if isinstance(stacks, Exception):
+                _LOGGER.warning("⚠️ Failed to fetch stacks, keeping previous data: %s", stacks)
+                stacks = list(self.stacks.values())
 
             # Defensive handling when API returns None (e.g., 403/404)
             if containers is None:
@@ -76,8 +141,10 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
             
             # Process containers
             self.containers = {}
+            self.container_list = []
             self.container_stack_map = {}
             self.container_stack_info = {}
+            previous_stable_map = self.stable_container_map
             self.stable_container_map = {}  # Reset stable container map
             
             stack_containers_count = 0
@@ -85,7 +152,7 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
             
             for container in containers:
                 container_id = container["Id"]
-                container_name = container.get("Names", ["unknown"])[0].strip("/")
+                container_name = _container_display_name(container)
                 container_state = container.get("State", {})
                 
                 # Handle both string and dictionary state formats
@@ -102,7 +169,7 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                 self.containers[container_id] = container
                 
                 # Only get stack information if stack view is enabled
-                if self.is_stack_view_enabled():
+                if self.stack_view_enabled:
                     # Extract stack information from container labels (much faster than individual inspection)
                     labels = container.get("Labels", {}) or {}
                     stack_name = labels.get("com.docker.compose.project")
@@ -119,40 +186,32 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                         }
                         self.container_stack_info[container_id] = stack_info
                         self.container_stack_map[container_id] = stack_name
+                        stable_id = f"{stack_name}_{service_name}"
                         stack_containers_count += 1
                         _LOGGER.debug("📦 Container %s belongs to stack %s", container_name, stack_name)
                     else:
                         # This is a standalone container
-                        stack_info = {
-                            "stack_name": None,
-                            "service_name": None,
-                            "container_number": None,
-                            "is_stack_container": False
-                        }
+                        stack_info = _EMPTY_STACK_INFO
                         self.container_stack_info[container_id] = stack_info
+                        stable_id = container_name
                         standalone_containers_count += 1
                         _LOGGER.debug("🏠 Container %s is standalone", container_name)
                 else:
                     # In lightweight mode, all containers are standalone
-                    standalone_containers_count += 1
-                
-                # Build stable container map
-                stack_info = self.container_stack_info.get(container_id, {
-                    "stack_name": None,
-                    "service_name": None,
-                    "container_number": None,
-                    "is_stack_container": False
-                })
-                
-                # Generate stable ID
-                if stack_info.get("is_stack_container"):
-                    stack_name = stack_info.get("stack_name", "unknown")
-                    service_name = stack_info.get("service_name", container_name)
-                    stable_id = f"{stack_name}_{service_name}"
-                else:
+                    stack_info = _EMPTY_STACK_INFO
                     stable_id = container_name
+                    standalone_containers_count += 1
                 
                 self.stable_container_map[stable_id] = container_id
+                self.container_list.append(NormalizedContainer(
+                    id=container_id,
+                    name=container_name,
+                    image=container.get("Image"),
+                    state=container_state,
+                    running=bool(is_running),
+                    stack_info=stack_info,
+                    stable_id=stable_id,
+                ))
             
             # Process stacks
             self.stacks = {}
@@ -162,51 +221,80 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                     self.stacks[stack_name] = stack
             
             # Check for updates if update sensors are enabled (but don't block initial load)
-            if self.is_update_sensors_enabled():
+            if self.update_sensors_enabled:
                 # Only check updates every 5 minutes to avoid performance issues
-                import time
                 current_time = time.time()
-                last_update_check = getattr(self, '_last_update_check', 0)
-                
-                if current_time - last_update_check > 300:  # 5 minutes
+                if current_time - self._last_update_check > UPDATE_CHECK_INTERVAL:
                     _LOGGER.debug("🔍 Checking for container updates...")
-                    self.update_availability = {}
-                    # Check updates for each container (this could be optimized further)
-                    for container_id in self.containers:
-                        try:
-                            has_updates = await self.api.images.check_image_updates(self.endpoint_id, container_id)
+                    # Only running containers are checked; stopped ones keep their last known result.
+                    # Containers running the same image share one check; run a bounded number at a time
+                    running_ids = {c.id for c in self.container_list if c.running}
+                    previous_availability = self.update_availability
+                    image_to_containers: Dict[tuple, List[str]] = defaultdict(list)
+                    for container_id, container in self.containers.items():
+                        if container_id not in running_ids:
+                            continue
+                        image_key = (container.get("Image"), container.get("ImageID") or container_id)
+                        image_to_containers[image_key].append(container_id)
+                    sem_updates = asyncio.Semaphore(UPDATE_CHECK_CONCURRENCY)
+
+                    async def check_updates(container_id: str) -> bool:
+                        async with sem_updates:
+                            return await self.api.images.check_image_updates(self.endpoint_id, container_id)
+
+                    groups = list(image_to_containers.values())
+                    results = await asyncio.gather(
+                        *(check_updates(container_ids[0]) for container_ids in groups),
+                        return_exceptions=True,
+                    )
+                    self.update_availability = {
+                        cid: previous_availability.get(cid, False)
+                        for cid in self.containers if cid not in running_ids
+                    }
+                    for container_ids, has_updates in zip(groups, results):
+                        if isinstance(has_updates, Exception):
+                            _LOGGER.debug("⚠️ Could not check updates for container %s: %s", container_ids[0], has_updates)
+                            has_updates = False
+                        for container_id in container_ids:
                             self.update_availability[container_id] = has_updates
-                        except Exception as e:
-                            _LOGGER.debug("⚠️ Could not check updates for container %s: %s", container_id, e)
-                            self.update_availability[container_id] = False
                     self._last_update_check = current_time
-                else:
-                    # Keep existing update availability data
-                    if not hasattr(self, 'update_availability'):
-                        self.update_availability = {}
+                # Otherwise keep the existing update availability data
             else:
                 self.update_availability = {}
             
             # Resource metrics aggregation
+            self._inspect_cache = {}
             self.metrics = {}
-            if self.is_resource_sensors_enabled():
-                sem = asyncio.Semaphore(4)
+            if self.resource_sensors_enabled:
+                sem = asyncio.Semaphore(METRICS_CONCURRENCY)
 
                 async def compute_metrics(container_id: str, container: Dict[str, Any]) -> None:
                     async with sem:
                         metrics: Dict[str, Any] = {}
+                        state = container.get("State", {})
+                        is_running = (state.get("Running") if isinstance(state, dict) else str(state).lower() == "running")
+                        # Stats (a slow sampling call) and the uptime inspect are independent, so issue them together
+                        requests = [self.api.get_container_stats(self.endpoint_id, container_id)]
+                        if is_running:
+                            requests.append(self._inspect_container_cached(container_id))
+                        results = await asyncio.gather(*requests, return_exceptions=True)
+                        stats = results[0]
+                        info = results[1] if is_running else None
+
                         try:
-                            stats = await self.api.get_container_stats(self.endpoint_id, container_id)
+                            if isinstance(stats, Exception):
+                                raise stats
                             if stats and "cpu_stats" in stats:
                                 cpu_stats = stats.get("cpu_stats", {})
                                 precpu_stats = stats.get("precpu_stats", {})
                                 cpu_delta = (
-                                    (cpu_stats.get("cpu_usage", {}) or {}).get("total", 0)
-                                    - (precpu_stats.get("cpu_usage", {}) or {}).get("total", 0)
+                                    (cpu_stats.get("cpu_usage", {}) or {}).get("total_usage", 0)
+                                    - (precpu_stats.get("cpu_usage", {}) or {}).get("total_usage", 0)
                                 )
                                 system_delta = cpu_stats.get("system_cpu_usage", 0) - precpu_stats.get("system_cpu_usage", 0)
+                                cpu_count = cpu_stats.get("online_cpus", 1)
                                 if system_delta > 0:
-                                    metrics["cpu_percent"] = round((cpu_delta / system_delta) * 100, 2)
+                                    metrics["cpu_percent"] = round((cpu_delta / system_delta) * cpu_count * 100, 2)
                             if stats and "memory_stats" in stats:
                                 memory_stats = stats.get("memory_stats", {})
                                 usage = memory_stats.get("usage", 0)
@@ -216,15 +304,13 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                         
                         # Uptime: only if running
                         try:
-                            state = container.get("State", {})
-                            is_running = (state.get("Running") if isinstance(state, dict) else str(state).lower() == "running")
+                            if isinstance(info, Exception):
+                                raise info
                             if is_running:
-                                info = await self.api.inspect_container(self.endpoint_id, container_id)
                                 started_at = (info or {}).get("State", {}).get("StartedAt")
                                 if started_at:
-                                    import datetime
-                                    start_time = datetime.datetime.fromisoformat(started_at.replace('Z', '+00:00'))
-                                    current_time = datetime.datetime.now(datetime.timezone.utc)
+                                    start_time = datetime.fromisoformat(started_at.replace('Z', '+00:00'))
+                                    current_time = datetime.now(timezone.utc)
                                     metrics["uptime_s"] = int((current_time - start_time).total_seconds())
                         except Exception as e:
                             _LOGGER.debug("⚠️ Failed to compute uptime for %s: %s", container_id, e)
@@ -234,16 +320,23 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                 
                 await asyncio.gather(*(compute_metrics(cid, cdata) for cid, cdata in self.containers.items()))
 
-            # Image/version metadata aggregation
-            self.image_data = {}
-            if self.is_version_sensors_enabled():
-                sem_img = asyncio.Semaphore(4)
+            # Image/version metadata aggregation: this changes far less often than container state,
+            # so keep it between ticks and only recompute it periodically or for new containers
+            if self.version_sensors_enabled:
+                current_time = time.time()
+                refresh_all = current_time - self._last_image_refresh > IMAGE_DATA_INTERVAL
+                pending = [cid for cid in self.containers if refresh_all or cid not in self.image_data]
+                self.image_data = {
+                    cid: data for cid, data in self.image_data.items()
+                    if cid in self.containers and cid not in pending
+                }
+                sem_img = asyncio.Semaphore(IMAGE_DATA_CONCURRENCY)
 
                 async def compute_image_data(container_id: str) -> None:
                     async with sem_img:
                         data: Dict[str, Any] = {}
                         try:
-                            info = await self.api.inspect_container(self.endpoint_id, container_id)
+                            info = await self._inspect_container_cached(container_id)
                             if not info:
                                 return
                             image_name = (info.get("Config", {}) or {}).get("Image")
@@ -263,7 +356,7 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                                     data["current_digest"] = current_digest
                             except Exception:
                                 pass
-                            if self.is_update_sensors_enabled() and image_name:
+                            if self.update_sensors_enabled and image_name:
                                 try:
                                     available_version = await self.api.get_available_version(self.endpoint_id, image_name)
                                     if available_version:
@@ -281,9 +374,16 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                         if data:
                             self.image_data[container_id] = data
 
-                await asyncio.gather(*(compute_image_data(cid) for cid in self.containers.keys()))
+                await asyncio.gather(*(compute_image_data(cid) for cid in pending))
+                if refresh_all:
+                    self._last_image_refresh = current_time
+            else:
+                self.image_data = {}
             
-            _LOGGER.info("✅ Updated Portainer data: %d containers (%d stack, %d standalone), %d stacks", 
+            self._inspect_cache = {}
+            self._rebind_container_entities(previous_stable_map)
+
+            _LOGGER.debug("✅ Updated Portainer data: %d containers (%d stack, %d standalone), %d stacks", 
                         len(self.containers), stack_containers_count, standalone_containers_count, len(self.stacks))
             
             return {
@@ -296,6 +396,42 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
             _LOGGER.exception("❌ Error updating Portainer data: %s", e)
             raise UpdateFailed(f"Failed to update Portainer data: {e}")
 
+    async def _inspect_container_cached(self, container_id: str) -> Dict[str, Any]:
+        """Inspect a container at most once per refresh."""
+        info = self._inspect_cache.get(container_id)
+        if info is None:
+            info = await self.api.inspect_container(self.endpoint_id, container_id)
+            self._inspect_cache[container_id] = info
+        return info
+
+    def register_container_entity(self, entity) -> None:
+        """Track an entity so it can be rebound when its container is recreated."""
+        self._container_entities[entity.stable_container_id].add(entity)
+        # Catch a recreation that happened between entity creation and registration
+        current_container_id = self.stable_container_map.get(entity.stable_container_id)
+        if current_container_id:
+            entity.update_container_id(current_container_id)
+
+    def unregister_container_entity(self, entity) -> None:
+        """Stop tracking an entity that is being removed."""
+        entities = self._container_entities.get(entity.stable_container_id)
+        if entities is not None:
+            entities.discard(entity)
+            if not entities:
+                del self._container_entities[entity.stable_container_id]
+
+    def _rebind_container_entities(self, previous_stable_map: Dict[str, str]) -> None:
+        """Point entities at the new container ID of every stable ID whose container changed."""
+        changed = {
+            stable_id: container_id
+            for stable_id, container_id in self.stable_container_map.items()
+            if previous_stable_map.get(stable_id) != container_id
+        }
+        # Nothing was recreated in the common case, so the loop below never runs
+        for stable_id, container_id in changed.items():
+            for entity in self._container_entities.get(stable_id, ()):
+                entity.update_container_id(container_id)
+
     def get_container(self, container_id: str) -> Optional[Dict[str, Any]]:
         """Get container data by ID."""
         return self.containers.get(container_id)
@@ -336,32 +472,58 @@ class PortainerDataUpdateCoordinator(DataUpdateCoordinator):
                 standalone_containers.append(container_data)
         return standalone_containers
 
-    # Feature toggle methods based on integration mode
+    # Feature toggle accessors (everything on unless configured off)
     def is_stack_view_enabled(self) -> bool:
         """Check if stack view is enabled."""
-        return self.config.get("enable_stack_view", False)
+        return self.stack_view_enabled
 
     def is_resource_sensors_enabled(self) -> bool:
         """Check if resource sensors are enabled."""
-        return self.config.get("enable_resource_sensors", False)
+        return self.resource_sensors_enabled
 
     def is_version_sensors_enabled(self) -> bool:
         """Check if version sensors are enabled."""
-        return self.config.get("enable_version_sensors", False)
+        return self.version_sensors_enabled
 
     def is_update_sensors_enabled(self) -> bool:
         """Check if update sensors are enabled."""
-        return self.config.get("enable_update_sensors", False)
+        return self.update_sensors_enabled
 
     def is_stack_buttons_enabled(self) -> bool:
         """Check if stack buttons are enabled."""
-        return self.config.get("enable_stack_buttons", False)
+        return self.stack_buttons_enabled
 
     def is_container_buttons_enabled(self) -> bool:
         """Check if container buttons are enabled."""
-        return self.config.get("enable_container_buttons", True)  # Always enabled by default
+        return self.container_buttons_enabled
+
+    @callback
+    def schedule_post_action_refresh(self, container_name: str, old_image_id: Optional[str]) -> None:
+        """Refresh once a recreated container is up on its new image, without blocking the caller."""
+        self.hass.async_create_background_task(
+            self._async_refresh_when_recreated(container_name, old_image_id),
+            name=f"{DOMAIN}_recreate_{container_name}",
+        )
+
+    async def _async_refresh_when_recreated(self, container_name: str, old_image_id: Optional[str]) -> None:
+        """Poll the container (by name, its ID changes on recreation) instead of sleeping a fixed time."""
+        deadline = time.monotonic() + POST_ACTION_TIMEOUT
+        while True:
+            if self.api.session is None:
+                return  # entry was unloaded while waiting
+            info = await self.api.inspect_container(self.endpoint_id, container_name) or {}
+            state = info.get("State")
+            if isinstance(state, dict) and state.get("Running") and info.get("Image") != old_image_id:
+                break
+            if time.monotonic() >= deadline:
+                _LOGGER.debug("⏱️ %s not running a new image after %ss, refreshing anyway",
+                              container_name, POST_ACTION_TIMEOUT)
+                break
+            await asyncio.sleep(POST_ACTION_POLL_INTERVAL)
+        await self.async_request_refresh()
 
     async def async_shutdown(self):
         """Shutdown the coordinator."""
-        if hasattr(self.api, 'close'):
-            await self.api.close()
+        await super().async_shutdown()
+        # PortainerAPI.close is idempotent, so this is safe alongside the unload path
+        await self.api.close()
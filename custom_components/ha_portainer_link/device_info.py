@@ -0,0 +1,72 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, Any
+
+from .const import DOMAIN
+
+# Default Portainer/HTTP(S) ports are dropped from display names
+_DEFAULT_PORT_RE = re.compile(r":(?:9000|9443|80|443)$")
+# Characters ignored when deciding whether the host is an IP address
+_IP_SEPARATORS = str.maketrans("", "", ".-_")
+# Characters replaced when the host name becomes part of a device identifier
+_HOST_ID_TRANS = str.maketrans({'.': '_', ':': '_'})
+
+@lru_cache(maxsize=32)
+def get_host_display_name(base_url: str) -> str:
+    """Extract a clean host name from the base URL for display purposes."""
+    # Remove protocol, trailing slash and common ports
+    host = base_url.removeprefix("https://").removeprefix("http://").rstrip("/")
+    host = _DEFAULT_PORT_RE.sub("", host, count=1)
+
+    # If the host is an IP address, keep it as is
+    # If it's a domain, try to extract a meaningful name
+    if host.translate(_IP_SEPARATORS).isdigit():
+        # It's an IP address, keep as is
+        return host
+    # It's a domain, use the main part (e.g., "portainer" from "portainer.example.com")
+    return host.split('.', 1)[0]
+
+@lru_cache(maxsize=32)
+def get_host_hash(base_url: str) -> str:
+    """Generate a short hash of the host URL for unique identification."""
+    # Not a security use; MD5 is kept because the hash is part of persisted device identifiers
+    return hashlib.md5(base_url.encode(), usedforsecurity=False).hexdigest()[:8]
+
+@lru_cache(maxsize=32)
+def _device_suffix(base_url: str) -> str:
+    """Return the host hash + sanitized host name used in device identifiers."""
+    host_name = get_host_display_name(base_url)
+    return f"{get_host_hash(base_url)}_{host_name.translate(_HOST_ID_TRANS)}"
+
+# Identifier strings are immutable and the same for every entity of a device, so they are
+# cached; the dicts handed to entities are built fresh so no caller shares a mutable one.
+# The caches are bounded because container IDs change on every recreation.
+@lru_cache(maxsize=256)
+def _stack_device_id(base_url: str, entry_id: str, endpoint_id: int, stack_name: str) -> str:
+    # Include entry_id, host hash and host name so stacks on different hosts never collide
+    return f"entry_{entry_id}_endpoint_{endpoint_id}_stack_{stack_name}_{_device_suffix(base_url)}"
+
+@lru_cache(maxsize=256)
+def _container_device_id(base_url: str, entry_id: str, endpoint_id: int, container_id: str) -> str:
+    return f"entry_{entry_id}_endpoint_{endpoint_id}_container_{container_id}_{_device_suffix(base_url)}"
+
+def create_stack_device_info(base_url: str, entry_id: str, endpoint_id: int, stack_name: str) -> Dict[str, Any]:
+    """Return device info for a Docker stack device."""
+    return {
+        "identifiers": {(DOMAIN, _stack_device_id(base_url, entry_id, endpoint_id, stack_name))},
+        "name": f"Stack: {stack_name} ({get_host_display_name(base_url)})",
+        "manufacturer": "Docker via Portainer",
+        "model": "Docker Stack",
+        "configuration_url": f"{base_url}/#!/stacks/{stack_name}",
+    }
+
+def create_container_device_info(base_url: str, entry_id: str, endpoint_id: int, container_id: str, container_name: str) -> Dict[str, Any]:
+    """Return device info for a standalone container device."""
+    return {
+        "identifiers": {(DOMAIN, _container_device_id(base_url, entry_id, endpoint_id, container_id))},
+        "name": f"{container_name} ({get_host_display_name(base_url)})",
+        "manufacturer": "Docker via Portainer",
+        "model": "Docker Container",
+        "configuration_url": f"{base_url}/#!/containers/{container_id}/details",
+    }
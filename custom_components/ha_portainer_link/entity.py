@@ -1,63 +1,25 @@
 import logging
-import hashlib
-from typing import Optional, Dict, Any
+from typing import Any, ClassVar, Dict, Optional
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 
 from .const import DOMAIN
 from .coordinator import PortainerDataUpdateCoordinator
-from . import create_portainer_device_info, create_stack_device_info, create_container_device_info
+from .device_info import create_stack_device_info, create_container_device_info
 
 _LOGGER = logging.getLogger(__name__)
 
-def _get_host_display_name(base_url: str) -> str:
-    """Extract a clean host name from the base URL for display purposes."""
-    # Remove protocol and common ports
-    host = base_url.replace("https://", "").replace("http://", "")
-    # Remove trailing slash if present
-    host = host.rstrip("/")
-    # Remove common ports
-    for port in [":9000", ":9443", ":80", ":443"]:
-        if host.endswith(port):
-            host = host[:-len(port)]
-    
-    # If the host is an IP address, keep it as is
-    # If it's a domain, try to extract a meaningful name
-    if host.replace('.', '').replace('-', '').replace('_', '').isdigit():
-        # It's an IP address, keep as is
-        return host
-    else:
-        # It's a domain, extract the main part
-        parts = host.split('.')
-        if len(parts) >= 2:
-            # Use the main domain part (e.g., "portainer" from "portainer.example.com")
-            return parts[0]
-        else:
-            return host
-
-def _get_simple_device_id(entry_id: str, endpoint_id: int, host_name: str, container_or_stack_name: str) -> str:
-    """Generate a simple, predictable device ID."""
-    # Use a simple format: entry_endpoint_host_container
-    sanitized_host = host_name.replace('.', '_').replace(':', '_').replace('-', '_')
-    sanitized_name = container_or_stack_name.replace('-', '_').replace(' ', '_')
-    return f"{entry_id}_{endpoint_id}_{sanitized_host}_{sanitized_name}"
-
-def _get_stable_entity_id(entry_id: str, endpoint_id: int, container_name: str, stack_info: Dict[str, Any], entity_type: str) -> str:
-    """Generate a stable entity ID that doesn't change when container is recreated."""
-    # For stack containers, use stack_name + service_name
-    if stack_info.get("is_stack_container"):
-        stack_name = stack_info.get("stack_name", "unknown")
-        service_name = stack_info.get("service_name", container_name)
-        # Use stack and service name for stability
-        stable_id = f"{stack_name}_{service_name}"
-    else:
-        # For standalone containers, use container name
-        stable_id = container_name
-    
-    # Sanitize the stable ID
-    sanitized_id = stable_id.replace('-', '_').replace(' ', '_').replace('/', '_')
-    return f"entry_{entry_id}_endpoint_{endpoint_id}_{sanitized_id}_{entity_type}"
+# Single-pass translation table for the ID sanitizer below
+_ID_TRANS = str.maketrans({'-': '_', ' ': '_', '/': '_'})
+
+def _sanitize_id(value: str) -> str:
+    """Make a name safe for use inside a unique ID."""
+    # Most names are already clean; skip building a new string for them
+    if '-' not in value and ' ' not in value and '/' not in value:
+        return value
+    return value.translate(_ID_TRANS)
 
 def _get_container_stable_id(container_name: str, stack_info: Dict[str, Any]) -> str:
     """Generate a stable container identifier that doesn't change when container is recreated."""
@@ -68,21 +30,79 @@ def _get_container_stable_id(container_name: str, stack_info: Dict[str, Any]) ->
     else:
         return container_name
 
+def _format_unique_id(entry_id: str, endpoint_id: int, stable_id: str, entity_type: str) -> str:
+    """Build the unique ID for an entity from its already-resolved stable ID."""
+    return f"entry_{entry_id}_endpoint_{endpoint_id}_{_sanitize_id(stable_id)}_{entity_type}"
+
+def async_migrate_unique_ids(
+    hass: HomeAssistant,
+    coordinator: PortainerDataUpdateCoordinator,
+    entry_id: str,
+    domain: str,
+    entity_types: tuple,
+) -> None:
+    """Move entities registered under container-ID based unique_ids to the stable format."""
+    try:
+        registry = er.async_get(hass)
+        endpoint_id = coordinator.endpoint_id
+        for container in coordinator.container_list:
+            container_id = container.id
+            # The coordinator already resolved the stable ID; don't redo it per entity type
+            stable_id = container.stable_id
+            for entity_type in entity_types:
+                old_uid = f"entry_{entry_id}_endpoint_{endpoint_id}_{container_id}_{entity_type}"
+                new_uid = _format_unique_id(entry_id, endpoint_id, stable_id, entity_type)
+                if old_uid == new_uid:
+                    continue
+                ent_id = registry.async_get_entity_id(domain, DOMAIN, old_uid)
+                if ent_id:
+                    try:
+                        registry.async_update_entity(ent_id, new_unique_id=new_uid)
+                        _LOGGER.debug("Migrated %s unique_id: %s -> %s", ent_id, old_uid, new_uid)
+                    except Exception as e:
+                        _LOGGER.debug("Could not migrate %s: %s", ent_id, e)
+    except Exception as e:
+        _LOGGER.debug("Entity registry migration skipped/failed for %s: %s", domain, e)
+
 class BasePortainerEntity(CoordinatorEntity):
     """Base class for all Portainer entities bound to the data update coordinator."""
 
+    # State comes from the coordinator; HA must never poll entities individually
+    _attr_should_poll = False
+
     def __init__(self, coordinator: PortainerDataUpdateCoordinator, entry_id: str):
         """Initialize the base entity."""
         super().__init__(coordinator)
         self.coordinator = coordinator
         self.entry_id = entry_id
-        self._attr_should_poll = False
 
     @property
     def available(self) -> bool:
         """Return True if entity is available."""
         return self.coordinator.last_update_success
 
+    async def _send_notification(self, title: str, message: str) -> None:
+        """Notify the user via the mobile app, falling back to a persistent notification."""
+        # Check for the service up front instead of catching ServiceNotFound on every action
+        if self.hass.services.has_service("notify", "mobile_app"):
+            domain, service, kind = "notify", "mobile_app", "Notification"
+        else:
+            domain, service, kind = "persistent_notification", "create", "Persistent notification"
+        try:
+            await self.hass.services.async_call(
+                domain, service, {"title": title, "message": message}, blocking=False
+            )
+            _LOGGER.info("%s sent: %s - %s", kind, title, message)
+        except Exception as e:
+            _LOGGER.debug("Could not send notification: %s", e)
+
+    @callback
+    def _async_refresh_in_background(self) -> None:
+        """Request a coordinator refresh without making the caller wait for it."""
+        self.hass.async_create_background_task(
+            self.coordinator.async_request_refresh(), name=f"{DOMAIN}_refresh_{self.entity_type}"
+        )
+
 class BaseContainerEntity(BasePortainerEntity):
     """Base class for container-specific entities."""
 
@@ -92,26 +112,23 @@ class BaseContainerEntity(BasePortainerEntity):
         entry_id: str, 
         container_id: str, 
         container_name: str, 
-        stack_info: Dict[str, Any]
+        stack_info: Dict[str, Any],
+        stable_id: Optional[str] = None,
     ):
-        """Initialize the container entity."""
+        """Initialize the container entity (pass the coordinator's stable_id when known)."""
         super().__init__(coordinator, entry_id)
         self.container_id = container_id
         self.container_name = container_name
         self.stack_info = stack_info
-        self.stable_container_id = _get_container_stable_id(container_name, stack_info)
-        self._attr_unique_id = _get_stable_entity_id(
-            entry_id, 
-            coordinator.endpoint_id, 
-            container_name, 
-            stack_info, 
-            self.entity_type
+        self.stable_container_id = stable_id or _get_container_stable_id(container_name, stack_info)
+        self._attr_unique_id = _format_unique_id(
+            entry_id, coordinator.endpoint_id, self.stable_container_id, self.entity_type
         )
+        self._attr_device_info = self._build_device_info()
+        self._update_from_coordinator()
 
-    @property
-    def entity_type(self) -> str:
-        """Return the entity type for unique ID generation."""
-        raise NotImplementedError
+    # Entity type used in the unique ID; every subclass sets it
+    entity_type: ClassVar[str]
 
     def update_container_id(self, new_container_id: str) -> None:
         """Update the container ID when container is recreated."""
@@ -119,65 +136,49 @@ class BaseContainerEntity(BasePortainerEntity):
             _LOGGER.info("🔄 Updating container ID for %s: %s -> %s", 
                         self.container_name, self.container_id[:12], new_container_id[:12])
             self.container_id = new_container_id
+            # Stack containers hang off the stack device, which does not depend on the container ID
+            if not self.stack_info.get("is_stack_container"):
+                self._attr_device_info = self._build_device_info()
+
+    async def async_added_to_hass(self) -> None:
+        """Let the coordinator rebind this entity when its container is recreated."""
+        await super().async_added_to_hass()
+        self.coordinator.register_container_entity(self)
+        self.async_on_remove(lambda: self.coordinator.unregister_container_entity(self))
 
-    def _find_current_container_id(self) -> Optional[str]:
-        """Find the current container ID for this entity based on stable ID."""
-        # Use coordinator's stable container map if available
-        if hasattr(self.coordinator, 'get_container_by_stable_id'):
-            current_container_id = self.coordinator.get_container_by_stable_id(self.stable_container_id)
-            if current_container_id:
-                return current_container_id
-        
-        # Fallback: search through all containers
-        for container_id, container_data in self.coordinator.containers.items():
-            container_name = container_data.get("Names", ["unknown"])[0].strip("/")
-            stack_info = self.coordinator.get_container_stack_info(container_id) or {
-                "stack_name": None,
-                "service_name": None,
-                "container_number": None,
-                "is_stack_container": False
-            }
-            stable_id = _get_container_stable_id(container_name, stack_info)
-            if stable_id == self.stable_container_id:
-                return container_id
-        return None
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Refresh cached attributes, then write state (the coordinator already rebound the ID)."""
+        self._update_from_coordinator()
+        super()._handle_coordinator_update()
+
+    def _update_from_coordinator(self) -> None:
+        """Refresh cached attributes from new coordinator data; override in subclasses."""
 
     def _get_container_data(self) -> Optional[Dict[str, Any]]:
         """Get current container data from coordinator."""
-        # First try the stored container ID
-        container_data = self.coordinator.get_container(self.container_id)
-        if container_data:
-            return container_data
-        
-        # If not found, try to find the current container ID
-        current_container_id = self._find_current_container_id()
-        if current_container_id:
-            self.update_container_id(current_container_id)
-            return self.coordinator.get_container(current_container_id)
-        
-        return None
+        # The coordinator rebinds recreated containers before entities are notified,
+        # so the stored ID is current and no per-read lookup is needed
+        return self.coordinator.get_container(self.container_id)
 
-    @property
-    def device_info(self) -> Dict[str, Any]:
-        """Return device info."""
-        host_name = _get_host_display_name(self.coordinator.api.base_url)
-        
+    def _build_device_info(self) -> Dict[str, Any]:
+        """Build device info; only changes when the container ID does."""
+        base_url = self.coordinator.api.base_url
         if self.stack_info.get("is_stack_container"):
             # For stack containers, use the stack as the parent device
             stack_name = self.stack_info.get("stack_name", "unknown_stack")
-            stack_id = self.stack_info.get("stack_id", stack_name)
-            return create_stack_device_info(self.entry_id, stack_id, stack_name)
+            return create_stack_device_info(base_url, self.entry_id, self.coordinator.endpoint_id, stack_name)
         else:
             # For standalone containers, use the container as the device
-            return create_container_device_info(self.entry_id, self.container_id, self.container_name, self.stack_info)
+            return create_container_device_info(
+                base_url, self.entry_id, self.coordinator.endpoint_id, self.container_id, self.container_name
+            )
 
     def _get_container_name_display(self) -> str:
         """Get display name for the container."""
-        if self.stack_info.get("is_stack_container"):
-            service_name = self.stack_info.get("service_name", self.container_name)
-            return f"{service_name}"
-        else:
-            return self.container_name
+        # Container names are unique per host; compose service names are not, so entity
+        # names always use the container name, for stack containers too
+        return self.container_name
 
 class BaseStackEntity(BasePortainerEntity):
     """Base class for stack-specific entities."""
@@ -191,17 +192,14 @@ class BaseStackEntity(BasePortainerEntity):
         """Initialize the stack entity."""
         super().__init__(coordinator, entry_id)
         self.stack_name = stack_name
-        self._attr_unique_id = f"entry_{entry_id}_endpoint_{coordinator.endpoint_id}_stack_{stack_name}_{self.entity_type}"
-
-    @property
-    def entity_type(self) -> str:
-        """Return the entity type for unique ID generation."""
-        raise NotImplementedError
+        # Same format stack buttons have always used, so existing entities keep their IDs
+        self._attr_unique_id = _format_unique_id(entry_id, coordinator.endpoint_id, stack_name, self.entity_type)
+        self._attr_device_info = create_stack_device_info(
+            coordinator.api.base_url, entry_id, coordinator.endpoint_id, stack_name
+        )
 
-    @property
-    def device_info(self) -> Dict[str, Any]:
-        """Return device info."""
-        return create_stack_device_info(self.entry_id, self.stack_name, self.stack_name)
+    # Entity type used in the unique ID; every subclass sets it
+    entity_type: ClassVar[str]
 
     def _get_stack_data(self) -> Optional[Dict[str, Any]]:
         """Get current stack data from coordinator."""
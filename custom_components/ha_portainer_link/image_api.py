@@ -1,8 +1,11 @@
+import asyncio
 import logging
 import aiohttp
 from typing import Optional, Dict, Any
 import time
+from datetime import datetime
 from aiohttp.client_exceptions import ClientConnectorCertificateError
+from homeassistant.util.json import json_loads
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -18,12 +21,14 @@ class PortainerImageAPI:
         self.session = session  # Use shared session from main API
         
         # Initialize rate limiting with fixed values (simplified)
-        self._cache_duration = 6 * 3600  # 6 hours in seconds
+        self._cache_duration = 6 * 3600  # 6 hours in seconds (moving tags such as :latest)
+        self._pinned_cache_duration = 24 * 3600  # 24 hours in seconds (pinned version tags)
         self._rate_limit_checks = 50
         self._rate_limit_period = 6 * 3600  # 6 hours in seconds
         
         # Initialize caches and counters
         self._update_cache: Dict[str, tuple] = {}
+        self._inflight_checks: Dict[str, asyncio.Task] = {}
         self._version_cache: Dict[str, tuple] = {}
         self._last_update_check = time.time()
         self._update_check_count = 0
@@ -60,153 +65,195 @@ class PortainerImageAPI:
                 if resp.status != 200:
                     _LOGGER.debug("Could not get current image info: %s", resp.status)
                     return False
-                current_image_data = await resp.json()
+                current_image_data = await resp.json(loads=json_loads)
                 # Prefer RepoDigests when available; fall back to Id
                 repo_digests = current_image_data.get("RepoDigests") or []
                 current_digest = (repo_digests[0] if repo_digests else current_image_data.get("Id", ""))
                 current_created = current_image_data.get("Created", "")
             
-            _LOGGER.debug("Current image digest: %s, created: %s", 
-                         (current_digest.split("@")[-1] if "@" in current_digest else current_digest)[:12] if current_digest else "unknown",
-                         current_created[:19] if current_created else "unknown")
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Current image digest: %s, created: %s", 
+                             (current_digest.split("@")[-1] if "@" in current_digest else current_digest)[:12] if current_digest else "unknown",
+                             current_created[:19] if current_created else "unknown")
             
-            # Check if we have a cached result for this image
+            # Serve cached results; once stale, keep serving the old value while the
+            # registry is re-checked in the background (stale-while-revalidate)
             cache_key = f"{image_name}_{current_digest[:12]}"
-            if cache_key in self._update_cache:
-                cached_result, cache_time = self._update_cache[cache_key]
-                # Use configurable cache duration
-                if (time.time() - cache_time) < self._cache_duration:
+            cached = self._update_cache.get(cache_key)
+            if cached is not None:
+                cached_result, cache_time = cached
+                if (time.time() - cache_time) < self._get_cache_ttl(image_name):
                     _LOGGER.debug("Using cached update check result for %s: %s", image_name, cached_result)
                     return cached_result
-            
-            # Check if we've made too many API calls recently (rate limiting)
-            current_time = time.time()
-            # Reset counter if rate limit period has passed
-            if (current_time - self._last_update_check) > self._rate_limit_period:
-                self._update_check_count = 0
-                self._last_update_check = current_time
-            
-            # Check against configurable rate limit
-            if self._update_check_count >= self._rate_limit_checks:
-                _LOGGER.debug("Rate limit reached for update checks (%d/%d), using cached result for %s", 
-                             self._update_check_count, self._rate_limit_checks, image_name)
-                # Return cached result or False if no cache
-                if cache_key in self._update_cache:
-                    return self._update_cache[cache_key][0]
-                return False
-            
-            # Increment counter
-            self._update_check_count += 1
-            
-            # Try to inspect the image on the registry without pulling
-            # This is more efficient and doesn't hit rate limits as hard
-            try:
-                # Use Docker Hub API for all Docker Hub images (both official and third-party)
-                # Official images: library/ubuntu, library/nginx (no slash in display name)
-                # Third-party images: interaapps/pastefy, jlesage/firefox (has slash)
-                # Custom images: localhost:5000/myapp, registry.company.com/app (not Docker Hub)
+                _LOGGER.debug("Cached update check for %s is stale, revalidating in background", image_name)
+                self._schedule_registry_check(session, cache_key, image_name, current_digest, current_created)
+                return cached_result
+
+            # Shielded: the check is shared, so one cancelled caller must not cancel it for the rest
+            return await asyncio.shield(
+                self._schedule_registry_check(session, cache_key, image_name, current_digest, current_created)
+            )
+
+        except Exception as e:
+            _LOGGER.exception("❌ Error checking image updates for container %s: %s", container_id, e)
+            return False
+
+    def _get_cache_ttl(self, image_name: str) -> int:
+        """Return how long an update check result stays fresh for this image reference."""
+        tag = image_name.rsplit(":", 1)[-1] if ":" in image_name.rsplit("/", 1)[-1] else "latest"
+        # Moving tags can change any time; pinned versions only get re-pushed rarely
+        if tag in ("latest", "stable", "main", "master", "nightly", "edge"):
+            return self._cache_duration
+        return self._pinned_cache_duration
+
+    def cancel_pending_checks(self) -> None:
+        """Cancel registry checks still running (shared or background revalidations)."""
+        for task in list(self._inflight_checks.values()):
+            task.cancel()
+        self._inflight_checks.clear()
+
+    def _schedule_registry_check(self, session, cache_key: str, image_name: str,
+                                 current_digest: str, current_created: str) -> asyncio.Task:
+        """Start the registry check for an image digest, or join the one already running.
+
+        Every running check stays in _inflight_checks until it finishes, so
+        cancel_pending_checks can stop them when the entry is unloaded.
+        """
+        task = self._inflight_checks.get(cache_key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(
+                self._check_registry(session, cache_key, image_name, current_digest, current_created)
+            )
+            self._inflight_checks[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight_checks.pop(cache_key, None))
+        return task
+
+    async def _check_registry(self, session, cache_key: str, image_name: str,
+                              current_digest: str, current_created: str) -> bool:
+        """Compare the local image digest with the registry and cache the result."""
+        # Check if we've made too many API calls recently (rate limiting)
+        current_time = time.time()
+        # Reset counter if rate limit period has passed
+        if (current_time - self._last_update_check) > self._rate_limit_period:
+            self._update_check_count = 0
+            self._last_update_check = current_time
+        
+        # Check against configurable rate limit
+        if self._update_check_count >= self._rate_limit_checks:
+            _LOGGER.debug("Rate limit reached for update checks (%d/%d), using cached result for %s", 
+                         self._update_check_count, self._rate_limit_checks, image_name)
+            # Return cached result or False if no cache
+            if cache_key in self._update_cache:
+                return self._update_cache[cache_key][0]
+            return False
+        
+        # Increment counter
+        self._update_check_count += 1
+        
+        # Try to inspect the image on the registry without pulling
+        # This is more efficient and doesn't hit rate limits as hard
+        try:
+            # Use Docker Hub API for all Docker Hub images (both official and third-party)
+            # Official images: library/ubuntu, library/nginx (no slash in display name)
+            # Third-party images: interaapps/pastefy, jlesage/firefox (has slash)
+            # Custom images: localhost:5000/myapp, registry.company.com/app (not Docker Hub)
+            
+            # Check if this is a Docker Hub image (not a custom registry)
+            if not any(registry in image_name for registry in ["localhost:", "registry.", "harbor.", "gitlab.", "github."]):
+                # This is a Docker Hub image - can use Docker Hub API
+                if ":" in image_name:
+                    tag = image_name.split(":")[-1]
+                    repo = image_name.split(":")[0]
+                else:
+                    tag = "latest"
+                    repo = image_name
                 
-                # Check if this is a Docker Hub image (not a custom registry)
-                if not any(registry in image_name for registry in ["localhost:", "registry.", "harbor.", "gitlab.", "github."]):
-                    # This is a Docker Hub image - can use Docker Hub API
-                    if ":" in image_name:
-                        tag = image_name.split(":")[-1]
-                        repo = image_name.split(":")[0]
-                    else:
-                        tag = "latest"
-                        repo = image_name
-                    
-                    # Handle both official (library/) and third-party (user/) images
-                    if repo.startswith("library/"):
-                        # Official image: library/ubuntu -> ubuntu
-                        clean_repo = repo.replace("library/", "")
-                        registry_url = f"https://registry.hub.docker.com/v2/repositories/library/{clean_repo}/tags/{tag}"
-                    elif "/" not in repo:
-                        # Official image without library/ prefix: mariadb -> library/mariadb
-                        registry_url = f"https://registry.hub.docker.com/v2/repositories/library/{repo}/tags/{tag}"
+                # Handle both official (library/) and third-party (user/) images
+                if repo.startswith("library/"):
+                    # Official image: library/ubuntu -> ubuntu
+                    clean_repo = repo.replace("library/", "")
+                    registry_url = f"https://registry.hub.docker.com/v2/repositories/library/{clean_repo}/tags/{tag}"
+                elif "/" not in repo:
+                    # Official image without library/ prefix: mariadb -> library/mariadb
+                    registry_url = f"https://registry.hub.docker.com/v2/repositories/library/{repo}/tags/{tag}"
+                else:
+                    # Third-party image: interaapps/pastefy -> interaapps/pastefy
+                    registry_url = f"https://registry.hub.docker.com/v2/repositories/{repo}/tags/{tag}"
+                
+                _LOGGER.debug("🔍 Checking Docker Hub API: %s", registry_url)
+                
+                # Use aiohttp to check registry metadata
+                async with session.get(registry_url, ssl=False) as registry_resp:
+                    if registry_resp.status == 200:
+                        registry_data = await registry_resp.json(loads=json_loads)
+                        # Prefer images[0].digest if available, else top-level digest
+                        images_list = registry_data.get("images") or []
+                        image_digest = None
+                        if images_list and isinstance(images_list[0], dict):
+                            image_digest = images_list[0].get("digest")
+                        if not image_digest:
+                            image_digest = registry_data.get("digest", "")
+                        if image_digest:
+                            short_registry = (image_digest.split(":")[-1])[:12]
+                            short_local = (current_digest.split("@")[-1] if "@" in current_digest else current_digest)[:12]
+                            if short_registry and short_local and short_registry != short_local:
+                                _LOGGER.debug("✅ New image available for %s (registry: %s, local: %s)", image_name, short_registry, short_local)
+                                self._update_cache[cache_key] = (True, time.time())
+                                return True
+                        _LOGGER.debug("✅ Image %s is up to date", image_name)
+                        self._update_cache[cache_key] = (False, time.time())
+                        return False
                     else:
-                        # Third-party image: interaapps/pastefy -> interaapps/pastefy
-                        registry_url = f"https://registry.hub.docker.com/v2/repositories/{repo}/tags/{tag}"
-                    
-                    _LOGGER.debug("🔍 Checking Docker Hub API: %s", registry_url)
-                    
-                    # Use aiohttp to check registry metadata
-                    async with session.get(registry_url, ssl=False) as registry_resp:
-                        if registry_resp.status == 200:
-                            registry_data = await registry_resp.json()
-                            # Prefer images[0].digest if available, else top-level digest
-                            images_list = registry_data.get("images") or []
-                            image_digest = None
-                            if images_list and isinstance(images_list[0], dict):
-                                image_digest = images_list[0].get("digest")
-                            if not image_digest:
-                                image_digest = registry_data.get("digest", "")
-                            if image_digest:
-                                short_registry = (image_digest.split(":")[-1])[:12]
-                                short_local = (current_digest.split("@")[-1] if "@" in current_digest else current_digest)[:12]
-                                if short_registry and short_local and short_registry != short_local:
-                                    _LOGGER.debug("✅ New image available for %s (registry: %s, local: %s)", image_name, short_registry, short_local)
-                                    self._update_cache[cache_key] = (True, time.time())
-                                    return True
-                            _LOGGER.debug("✅ Image %s is up to date", image_name)
+                        _LOGGER.debug("Could not check Docker Hub for %s: HTTP %s", image_name, registry_resp.status)
+                        # Handle specific HTTP status codes for update checks
+                        if registry_resp.status == 429:
+                            _LOGGER.debug("Rate limited for %s - assuming no update available", image_name)
+                            self._update_cache[cache_key] = (False, time.time())
+                            return False
+                        elif registry_resp.status == 404:
+                            _LOGGER.debug("Tag not found for %s - assuming no update available", image_name)
+                            self._update_cache[cache_key] = (False, time.time())
+                            return False
+                        elif registry_resp.status == 403:
+                            _LOGGER.debug("Access denied for %s - assuming no update available", image_name)
                             self._update_cache[cache_key] = (False, time.time())
                             return False
                         else:
-                            _LOGGER.debug("Could not check Docker Hub for %s: HTTP %s", image_name, registry_resp.status)
-                            # Handle specific HTTP status codes for update checks
-                            if registry_resp.status == 429:
-                                _LOGGER.debug("Rate limited for %s - assuming no update available", image_name)
-                                self._update_cache[cache_key] = (False, time.time())
-                                return False
-                            elif registry_resp.status == 404:
-                                _LOGGER.debug("Tag not found for %s - assuming no update available", image_name)
-                                self._update_cache[cache_key] = (False, time.time())
-                                return False
-                            elif registry_resp.status == 403:
-                                _LOGGER.debug("Access denied for %s - assuming no update available", image_name)
-                                self._update_cache[cache_key] = (False, time.time())
-                                return False
-                            else:
-                                _LOGGER.debug("HTTP %s error for %s - assuming no update available", registry_resp.status, image_name)
-                                self._update_cache[cache_key] = (False, time.time())
-                                return False
-                else:
-                    # Custom registry image - try to use Portainer's built-in update check
-                    # This is more reliable than trying to parse custom registry APIs
-                    _LOGGER.debug("Custom registry image %s - using Portainer's update detection", image_name)
-                    
-                    # For custom registry images, we'll use a more conservative approach
-                    # Check if the container is running and if the image is recent
-                    if current_created:
-                        try:
-                            from datetime import datetime
-                            created_time = datetime.fromisoformat(current_created.replace('Z', '+00:00'))
-                            current_age = (datetime.now(created_time.tzinfo) - created_time).days
-                            
-                            # If image is older than 30 days, suggest checking for updates
-                            if current_age > 30:
-                                _LOGGER.debug("Image %s is %d days old - suggesting update check", image_name, current_age)
-                                self._update_cache[cache_key] = (True, time.time())
-                                return True
-                            else:
-                                _LOGGER.debug("Image %s is %d days old - likely up to date", image_name, current_age)
-                                self._update_cache[cache_key] = (False, time.time())
-                                return False
-                        except Exception as parse_e:
-                            _LOGGER.debug("Could not parse image creation time: %s", parse_e)
-                    
-                    # Default to no update available for custom registry images
-                    self._update_cache[cache_key] = (False, time.time())
-                    return False
-                    
-            except Exception as e:
-                _LOGGER.debug("Error checking registry for %s: %s", image_name, e)
-                # Cache the failure for a shorter time
+                            _LOGGER.debug("HTTP %s error for %s - assuming no update available", registry_resp.status, image_name)
+                            self._update_cache[cache_key] = (False, time.time())
+                            return False
+            else:
+                # Custom registry image - try to use Portainer's built-in update check
+                # This is more reliable than trying to parse custom registry APIs
+                _LOGGER.debug("Custom registry image %s - using Portainer's update detection", image_name)
+                
+                # For custom registry images, we'll use a more conservative approach
+                # Check if the container is running and if the image is recent
+                if current_created:
+                    try:
+                        created_time = datetime.fromisoformat(current_created.replace('Z', '+00:00'))
+                        current_age = (datetime.now(created_time.tzinfo) - created_time).days
+                        
+                        # If image is older than 30 days, suggest checking for updates
+                        if current_age > 30:
+                            _LOGGER.debug("Image %s is %d days old - suggesting update check", image_name, current_age)
+                            self._update_cache[cache_key] = (True, time.time())
+                            return True
+                        else:
+                            _LOGGER.debug("Image %s is %d days old - likely up to date", image_name, current_age)
+                            self._update_cache[cache_key] = (False, time.time())
+                            return False
+                    except Exception as parse_e:
+                        _LOGGER.debug("Could not parse image creation time: %s", parse_e)
+                
+                # Default to no update available for custom registry images
                 self._update_cache[cache_key] = (False, time.time())
                 return False
                 
         except Exception as e:
-            _LOGGER.exception("❌ Error checking image updates for container %s: %s", container_id, e)
+            _LOGGER.debug("Error checking registry for %s: %s", image_name, e)
+            # Cache the failure for a shorter time
+            self._update_cache[cache_key] = (False, time.time())
             return False
 
     async def pull_image_update(self, endpoint_id: int, container_id: str) -> bool:
@@ -253,7 +300,7 @@ class PortainerImageAPI:
                 session = self.session or self.auth.session
                 async with session.get(image_url, headers=self.auth.get_headers(), ssl=self.ssl_verify) as resp:
                     if resp.status == 200:
-                        return await resp.json()
+                        return await resp.json(loads=json_loads)
                     else:
                         _LOGGER.error("❌ Failed to get image info: HTTP %s", resp.status)
                         return None
@@ -266,7 +313,7 @@ class PortainerImageAPI:
                             _LOGGER.info("✅ Successfully connected with SSL disabled")
                             # Update SSL setting for future calls
                             self.ssl_verify = False
-                            return await resp.json()
+                            return await resp.json(loads=json_loads)
                         else:
                             _LOGGER.error("❌ Failed to get image info: HTTP %s", resp.status)
                             return None
@@ -315,7 +362,6 @@ class PortainerImageAPI:
             if created:
                 # Extract date from ISO format
                 try:
-                    from datetime import datetime
                     dt = datetime.fromisoformat(created.replace("Z", "+00:00"))
                     return dt.strftime("%Y.%m.%d")
                 except:
@@ -400,7 +446,7 @@ class PortainerImageAPI:
                     
                     async with session.get(registry_url, ssl=False) as registry_resp:
                         if registry_resp.status == 200:
-                            registry_data = await registry_resp.json()
+                            registry_data = await registry_resp.json(loads=json_loads)
                             
                             # Try to get version from various sources
                             version = None
@@ -434,7 +480,6 @@ class PortainerImageAPI:
                                         created = registry_data["images"][0].get("created", "")
                                         if created:
                                             try:
-                                                from datetime import datetime
                                                 dt = datetime.fromisoformat(created.replace("Z", "+00:00"))
                                                 version = dt.strftime("%Y.%m.%d")
                                             except:
@@ -517,7 +562,7 @@ class PortainerImageAPI:
                 if resp.status != 200:
                     _LOGGER.debug("Could not get current image info: %s", resp.status)
                     return "unknown"
-                current_image_data = await resp.json()
+                current_image_data = await resp.json(loads=json_loads)
                 # Prefer RepoDigests when available; fall back to Id
                 repo_digests = current_image_data.get("RepoDigests") or []
                 digest = (repo_digests[0] if repo_digests else current_image_data.get("Id", ""))
@@ -583,7 +628,7 @@ class PortainerImageAPI:
                     
                     async with session.get(registry_url, ssl=False) as registry_resp:
                         if registry_resp.status == 200:
-                            registry_data = await registry_resp.json()
+                            registry_data = await registry_resp.json(loads=json_loads)
                             # Prefer images[0].digest if available, else top-level digest
                             images_list = registry_data.get("images") or []
                             image_digest = None
@@ -632,7 +677,7 @@ class PortainerImageAPI:
                 session = self.session or self.auth.session
                 async with session.get(container_url, headers=self.auth.get_headers(), ssl=self.ssl_verify) as resp:
                     if resp.status == 200:
-                        return await resp.json()
+                        return await resp.json(loads=json_loads)
                     else:
                         _LOGGER.error("❌ Failed to get container info: HTTP %s", resp.status)
                         return None
@@ -645,7 +690,7 @@ class PortainerImageAPI:
                             _LOGGER.info("✅ Successfully connected with SSL disabled")
                             # Update SSL setting for future calls
                             self.ssl_verify = False
-                            return await resp.json()
+                            return await resp.json(loads=json_loads)
                         else:
                             _LOGGER.error("❌ Failed to get container info: HTTP %s", resp.status)
                             return None
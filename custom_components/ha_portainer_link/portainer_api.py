@@ -1,29 +1,63 @@
-import logging
 import asyncio
+import base64
+import logging
+import time
 import aiohttp
+from homeassistant.util.json import json_loads
+
+from .const import STACK_ACTION_CONCURRENCY
+from .container_api import PortainerContainerAPI
+from .image_api import PortainerImageAPI
+from .stack_api import PortainerStackAPI
 
 _LOGGER = logging.getLogger(__name__)
 
+# Re-authenticate this long before the JWT expires so no request runs into a 401
+REAUTH_MARGIN = 600
+
+def _jwt_expiry(token):
+    """Return the exp claim of a JWT, or None if it cannot be read."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json_loads(base64.urlsafe_b64decode(payload)).get("exp"))
+    except Exception:
+        return None
+
 class PortainerAPI:
-    def __init__(self, host, username=None, password=None, api_key=None):
+    def __init__(self, host, username=None, password=None, api_key=None, session=None):
         self.base_url = host.rstrip("/")
         self.username = username
         self.password = password
         self.api_key = api_key
         self.token = None
-        self.session = aiohttp.ClientSession()
+        self.token_expires_at = None
+        # A caller-provided session (e.g. Home Assistant's shared one) is never closed by us
+        self.session = session
+        self._owns_session = session is None
         self.headers = {}
+        # Sub-APIs used by the coordinator; they fall back to this instance's session and headers
+        self.containers = PortainerContainerAPI(self.base_url, self, ssl_verify=False)
+        self.images = PortainerImageAPI(self.base_url, self, ssl_verify=False)
+        self.stacks = PortainerStackAPI(self.base_url, self, ssl_verify=False)
 
     async def initialize(self):
+        # Fall back to one pooled session per API instance; reused by every call and sub-API.
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, limit_per_host=20, keepalive_timeout=75)
+            )
+            self._owns_session = True
         if self.api_key:
             self.headers = {
                 "X-API-Key": self.api_key,
                 "Content-Type": "application/json",
             }
-        elif self.username and self.password:
-            await self.authenticate()
-        else:
-            _LOGGER.error("[PortainerAPI] No credentials provided.")
+            return True
+        if self.username and self.password:
+            return await self.authenticate()
+        _LOGGER.error("[PortainerAPI] No credentials provided.")
+        return False
 
     async def authenticate(self):
         url = f"{self.base_url}/api/auth"
@@ -31,24 +65,36 @@ class PortainerAPI:
         try:
             async with self.session.post(url, json=payload, ssl=False) as resp:
                 if resp.status == 200:
-                    data = await resp.json()
+                    # Only the jwt field is needed; skip the mimetype check
+                    data = await resp.json(loads=json_loads, content_type=None)
                     self.token = data.get("jwt")
+                    self.token_expires_at = _jwt_expiry(self.token)
                     self.headers = {
                         "Authorization": f"Bearer {self.token}",
                         "Content-Type": "application/json",
                     }
-                    _LOGGER.info("[PortainerAPI] Authentifiziert.")
-                else:
-                    _LOGGER.error("[PortainerAPI] Authentifizierung fehlgeschlagen: %s", resp.status)
+                    _LOGGER.debug("[PortainerAPI] Authentifiziert.")
+                    return True
+                _LOGGER.error("[PortainerAPI] Authentifizierung fehlgeschlagen: %s", resp.status)
         except Exception as e:
             _LOGGER.exception("[PortainerAPI] Fehler bei Authentifizierung: %s", e)
+        return False
+
+    async def ensure_authenticated(self):
+        """Renew the JWT shortly before it expires (no-op for API key auth)."""
+        if self.api_key or self.token_expires_at is None:
+            return True
+        if time.time() < self.token_expires_at - REAUTH_MARGIN:
+            return True
+        _LOGGER.debug("[PortainerAPI] JWT expires soon, re-authenticating")
+        return await self.authenticate()
 
     async def get_containers(self, endpoint_id):
         url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/json?all=1"
         try:
             async with self.session.get(url, headers=self.headers, ssl=False) as resp:
                 if resp.status == 200:
-                    return await resp.json()
+                    return await resp.json(loads=json_loads)
                 else:
                     _LOGGER.error("[PortainerAPI] Fehler beim Abruf der Container: %s", resp.status)
                     return []
@@ -70,7 +116,7 @@ class PortainerAPI:
         try:
             async with self.session.get(url, headers=self.headers, ssl=False) as resp:
                 if resp.status == 200:
-                    container_data = await resp.json()
+                    container_data = await resp.json(loads=json_loads)
                     _LOGGER.debug("✅ Successfully inspected container %s", container_id)
                     return container_data
                 else:
@@ -85,7 +131,7 @@ class PortainerAPI:
         try:
             async with self.session.get(url, headers=self.headers, ssl=False) as resp:
                 if resp.status == 200:
-                    return await resp.json()
+                    return await resp.json(loads=json_loads)
                 else:
                     _LOGGER.error("[PortainerAPI] Failed to get stats: %s", resp.status)
                     return {}
@@ -144,7 +190,7 @@ class PortainerAPI:
                 if resp.status != 200:
                     _LOGGER.debug("Could not get current image info: %s", resp.status)
                     return False
-                current_image_data = await resp.json()
+                current_image_data = await resp.json(loads=json_loads)
                 current_digest = current_image_data.get("Id", "")
             
             _LOGGER.debug("Current image digest: %s", current_digest[:12] if current_digest else "unknown")
@@ -162,7 +208,7 @@ class PortainerAPI:
                     images_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/images/json"
                     async with self.session.get(images_url, headers=self.headers, ssl=False) as resp2:
                         if resp2.status == 200:
-                            images_data = await resp2.json()
+                            images_data = await resp2.json(loads=json_loads)
                             # Find the image with the same name but potentially different digest
                             for image in images_data:
                                 repo_tags = image.get("RepoTags", [])
@@ -172,7 +218,7 @@ class PortainerAPI:
                                     
                                     # Compare digests to see if there's an update
                                     has_update = new_digest != current_digest
-                                    _LOGGER.info("Update check for %s: %s (current: %s, new: %s)", 
+                                    _LOGGER.debug("Update check for %s: %s (current: %s, new: %s)", 
                                                image_name, has_update, 
                                                current_digest[:12] if current_digest else "unknown",
                                                new_digest[:12] if new_digest else "unknown")
@@ -184,7 +230,7 @@ class PortainerAPI:
                                                    current_digest[:12] if current_digest else "unknown",
                                                    new_digest[:12] if new_digest else "unknown")
                                     else:
-                                        _LOGGER.info("ℹ️ No update available for %s: same digest %s", 
+                                        _LOGGER.debug("ℹ️ No update available for %s: same digest %s", 
                                                    image_name, 
                                                    current_digest[:12] if current_digest else "unknown")
                                     
@@ -325,9 +371,6 @@ class PortainerAPI:
                 if resp.status not in [204, 304]:  # 304 means already stopped
                     _LOGGER.warning("Could not stop container %s: %s", container_name, resp.status)
             
-            # Wait a moment for the container to stop
-            await asyncio.sleep(2)
-            
             # Remove the old container
             _LOGGER.info("🗑️ Removing old container %s", container_name)
             remove_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}?force=1"
@@ -335,9 +378,6 @@ class PortainerAPI:
                 if resp.status not in [204, 404]:  # 404 means already removed
                     _LOGGER.warning("Could not remove container %s: %s", container_name, resp.status)
             
-            # Wait a moment for removal to complete
-            await asyncio.sleep(2)
-            
             # Create new container with the same configuration
             _LOGGER.info("🏗️ Creating new container %s", container_name)
             create_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/create"
@@ -430,7 +470,7 @@ class PortainerAPI:
             
             async with self.session.post(create_url, headers=self.headers, json=create_payload, ssl=False) as resp:
                 if resp.status == 201:
-                    new_container_data = await resp.json()
+                    new_container_data = await resp.json(loads=json_loads)
                     new_container_id = new_container_data.get("Id")
                     _LOGGER.info("✅ Successfully created new container %s with ID %s", container_name, new_container_id)
                     
@@ -469,7 +509,7 @@ class PortainerAPI:
             url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/images/{image_id}/json"
             async with self.session.get(url, headers=self.headers, ssl=False) as resp:
                 if resp.status == 200:
-                    return await resp.json()
+                    return await resp.json(loads=json_loads)
                 else:
                     _LOGGER.debug("Could not get image info for %s: %s", image_id, resp.status)
                     return None
@@ -514,6 +554,14 @@ class PortainerAPI:
             _LOGGER.debug("Error extracting version from image: %s", e)
             return "unknown"
 
+    async def get_current_digest(self, endpoint_id, container_id):
+        """Get the short digest of the image a container is running."""
+        return await self.images.get_current_digest(endpoint_id, container_id)
+
+    async def get_available_digest(self, endpoint_id, container_id):
+        """Get the short digest of the newest image available in the registry."""
+        return await self.images.get_available_digest(endpoint_id, container_id)
+
     async def get_available_version(self, endpoint_id, image_name):
         """Get the available version from the registry."""
         try:
@@ -523,7 +571,7 @@ class PortainerAPI:
             images_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/images/json"
             async with self.session.get(images_url, headers=self.headers, ssl=False) as resp:
                 if resp.status == 200:
-                    images_data = await resp.json()
+                    images_data = await resp.json(loads=json_loads)
                     # Find the image with the same name
                     for image in images_data:
                         repo_tags = image.get("RepoTags", [])
@@ -544,7 +592,7 @@ class PortainerAPI:
                     # Get the newly pulled image info
                     async with self.session.get(images_url, headers=self.headers, ssl=False) as resp2:
                         if resp2.status == 200:
-                            images_data = await resp2.json()
+                            images_data = await resp2.json(loads=json_loads)
                             # Find the image with the same name
                             for image in images_data:
                                 repo_tags = image.get("RepoTags", [])
@@ -583,13 +631,16 @@ class PortainerAPI:
             _LOGGER.warning("⚠️ Error getting available version for %s: %s", image_name, e)
             return "unknown (error)"
 
-    async def get_stacks(self):
-        """Get all stacks from Portainer."""
+    async def get_stacks(self, endpoint_id=None):
+        """Get all stacks from Portainer, optionally only those on one endpoint."""
         try:
             stacks_url = f"{self.base_url}/api/stacks"
             async with self.session.get(stacks_url, headers=self.headers, ssl=False) as resp:
                 if resp.status == 200:
-                    return await resp.json()
+                    stacks = await resp.json(loads=json_loads)
+                    if endpoint_id is not None:
+                        stacks = [s for s in stacks if s.get("EndpointId") == endpoint_id]
+                    return stacks
                 else:
                     _LOGGER.error("Could not get stacks list: %s", resp.status)
                     return []
@@ -642,51 +693,62 @@ class PortainerAPI:
                 "is_stack_container": False
             }
 
+    async def _stack_container_action(self, endpoint_id, container_id, action):
+        """POST start/stop to one stack container; True on success."""
+        url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}/{action}"
+        try:
+            async with self.session.post(url, headers=self.headers, ssl=False) as resp:
+                if resp.status == 204:
+                    _LOGGER.debug("✅ %s container %s", action, container_id)
+                    return True
+                _LOGGER.warning("⚠️ Failed to %s container %s: %s", action, container_id, resp.status)
+        except Exception as e:
+            _LOGGER.warning("⚠️ Error on %s for container %s: %s", action, container_id, e)
+        return False
+
+    async def _get_stack_container_ids(self, endpoint_id, stack_name):
+        """Return the IDs of all containers labelled as part of the stack, or None on error."""
+        containers_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/json?all=1"
+        async with self.session.get(containers_url, headers=self.headers, ssl=False) as resp:
+            if resp.status != 200:
+                _LOGGER.error("Could not get containers list: %s", resp.status)
+                return None
+            containers_data = await resp.json(loads=json_loads)
+        return [
+            container["Id"] for container in containers_data
+            if (container.get("Labels") or {}).get("com.docker.compose.project") == stack_name
+        ]
+
+    async def _stack_action(self, endpoint_id, stack_name, action):
+        """Apply start/stop to every container of a stack concurrently."""
+        stack_containers = await self._get_stack_container_ids(endpoint_id, stack_name)
+        if stack_containers is None:
+            return False
+        if not stack_containers:
+            _LOGGER.warning("No containers found for stack %s", stack_name)
+            return False
+
+        _LOGGER.info("Found %d containers in stack %s", len(stack_containers), stack_name)
+
+        # Containers are independent here, so run them in parallel, but cap the fan-out so a
+        # large stack doesn't hit Portainer with one burst of requests
+        sem = asyncio.Semaphore(STACK_ACTION_CONCURRENCY)
+
+        async def _bounded(container_id):
+            async with sem:
+                return await self._stack_container_action(endpoint_id, container_id, action)
+
+        results = await asyncio.gather(*(_bounded(container_id) for container_id in stack_containers))
+        success_count = sum(results)
+        _LOGGER.info("✅ Successfully ran %s on %d/%d containers in stack %s",
+                   action, success_count, len(stack_containers), stack_name)
+        return success_count > 0
+
     async def stop_stack(self, endpoint_id, stack_name):
         """Stop all containers in a stack."""
         try:
             _LOGGER.info("🛑 Stopping stack %s", stack_name)
-            
-            # Get all containers in the stack
-            containers_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/json?all=1"
-            async with self.session.get(containers_url, headers=self.headers, ssl=False) as resp:
-                if resp.status != 200:
-                    _LOGGER.error("Could not get containers list: %s", resp.status)
-                    return False
-                
-                containers_data = await resp.json()
-                stack_containers = []
-                
-                # Find all containers belonging to this stack
-                for container in containers_data:
-                    labels = container.get("Labels", {})
-                    if labels.get("com.docker.compose.project") == stack_name:
-                        stack_containers.append(container["Id"])
-                
-                if not stack_containers:
-                    _LOGGER.warning("No containers found for stack %s", stack_name)
-                    return False
-                
-                _LOGGER.info("Found %d containers in stack %s", len(stack_containers), stack_name)
-                
-                # Stop each container in the stack
-                success_count = 0
-                for container_id in stack_containers:
-                    try:
-                        stop_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}/stop"
-                        async with self.session.post(stop_url, headers=self.headers, ssl=False) as stop_resp:
-                            if stop_resp.status == 204:
-                                success_count += 1
-                                _LOGGER.debug("✅ Stopped container %s", container_id)
-                            else:
-                                _LOGGER.warning("⚠️ Failed to stop container %s: %s", container_id, stop_resp.status)
-                    except Exception as e:
-                        _LOGGER.warning("⚠️ Error stopping container %s: %s", container_id, e)
-                
-                _LOGGER.info("✅ Successfully stopped %d/%d containers in stack %s", 
-                           success_count, len(stack_containers), stack_name)
-                return success_count > 0
-                
+            return await self._stack_action(endpoint_id, stack_name, "stop")
         except Exception as e:
             _LOGGER.exception("❌ Error stopping stack %s: %s", stack_name, e)
             return False
@@ -695,56 +757,35 @@ class PortainerAPI:
         """Start all containers in a stack."""
         try:
             _LOGGER.info("▶️ Starting stack %s", stack_name)
-            
-            # Get all containers in the stack
-            containers_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/json?all=1"
-            async with self.session.get(containers_url, headers=self.headers, ssl=False) as resp:
-                if resp.status != 200:
-                    _LOGGER.error("Could not get containers list: %s", resp.status)
-                    return False
-                
-                containers_data = await resp.json()
-                stack_containers = []
-                
-                # Find all containers belonging to this stack
-                for container in containers_data:
-                    labels = container.get("Labels", {})
-                    if labels.get("com.docker.compose.project") == stack_name:
-                        stack_containers.append(container["Id"])
-                
-                if not stack_containers:
-                    _LOGGER.warning("No containers found for stack %s", stack_name)
-                    return False
-                
-                _LOGGER.info("Found %d containers in stack %s", len(stack_containers), stack_name)
-                
-                # Start each container in the stack
-                success_count = 0
-                for container_id in stack_containers:
-                    try:
-                        start_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}/start"
-                        async with self.session.post(start_url, headers=self.headers, ssl=False) as start_resp:
-                            if start_resp.status == 204:
-                                success_count += 1
-                                _LOGGER.debug("✅ Started container %s", container_id)
-                            else:
-                                _LOGGER.warning("⚠️ Failed to start container %s: %s", container_id, start_resp.status)
-                    except Exception as e:
-                        _LOGGER.warning("⚠️ Error starting container %s: %s", container_id, e)
-                
-                _LOGGER.info("✅ Successfully started %d/%d containers in stack %s", 
-                           success_count, len(stack_containers), stack_name)
-                return success_count > 0
-                
+            return await self._stack_action(endpoint_id, stack_name, "start")
         except Exception as e:
             _LOGGER.exception("❌ Error starting stack %s: %s", stack_name, e)
             return False
 
+    async def close(self):
+        """Stop background image checks and close the HTTP session if this instance created it."""
+        self.images.cancel_pending_checks()
+        if self._owns_session and self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
     # ---------------------------
     # Added helpers for stack update integration
     # ---------------------------
     def get_headers(self):
-        """Return current headers for API requests (used by sub-APIs)."""
+        """Return current headers for API requests (used by sub-APIs).
+
+        The dict is built once when credentials are set and shared by every request.
+        It is deliberately not set as session default headers, because the same
+        session also talks to public registries that must not receive Portainer credentials.
+        """
         return self.headers
 
     async def update_stack(self, endpoint_id, stack_name, *, pull_image: bool = True, prune: bool = False, wait_timeout: float = 90.0, wait_interval: float = 2.0):
@@ -752,14 +793,7 @@ class PortainerAPI:
         Returns a result dict from the underlying stack API.
         """
         try:
-            from .stack_api import PortainerStackAPI
-        except Exception as e:
-            _LOGGER.exception("❌ Failed to import PortainerStackAPI: %s", e)
-            return {"ok": False, "error": str(e)}
-
-        stack_api = PortainerStackAPI(self.base_url, self, ssl_verify=False, session=self.session)
-        try:
-            result = await stack_api.update_stack(
+            result = await self.stacks.update_stack(
                 endpoint_id,
                 stack_name,
                 pull_image=pull_image,
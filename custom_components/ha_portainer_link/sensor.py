@@ -1,491 +1,191 @@
 import logging
-import hashlib
-from homeassistant.helpers.entity import Entity
+from typing import ClassVar
+from homeassistant.components.sensor import SensorEntity
 from homeassistant.const import STATE_UNKNOWN
-from homeassistant.helpers import entity_registry as er
 from .const import DOMAIN
-from .portainer_api import PortainerAPI
+from .entity import BaseContainerEntity, async_migrate_unique_ids
 
 _LOGGER = logging.getLogger(__name__)
-_LOGGER.info("Loaded Portainer sensor integration.")
-
-def _build_stable_unique_id(entry_id, endpoint_id, container_name, stack_info, suffix):
-    if stack_info.get("is_stack_container"):
-        stack_name = stack_info.get("stack_name", "unknown")
-        service_name = stack_info.get("service_name", container_name)
-        base = f"{stack_name}_{service_name}"
-    else:
-        base = container_name
-    sanitized = base.replace('-', '_').replace(' ', '_').replace('/', '_')
-    return f"entry_{entry_id}_endpoint_{endpoint_id}_{sanitized}_{suffix}"
-
-def _get_host_display_name(base_url):
-    """Extract a clean host name from the base URL for display purposes."""
-    # Remove protocol and common ports
-    host = base_url.replace("https://", "http://").replace("http://", "")
-    # Remove trailing slash if present
-    host = host.rstrip("/")
-    # Remove common ports
-    for port in [":9000", ":9443", ":80", ":443"]:
-        if host.endswith(port):
-            host = host[:-len(port)]
-    
-    # If the host is an IP address, keep it as is
-    # If it's a domain, try to extract a meaningful name
-    if host.replace('.', '').replace('-', '').replace('_', '').isdigit():
-        # It's an IP address, keep as is
-        return host
-    else:
-        # It's a domain, extract the main part
-        parts = host.split('.')
-        if len(parts) >= 2:
-            # Use the main domain part (e.g., "portainer" from "portainer.example.com")
-            return parts[0]
-        else:
-            return host
 
-def _get_host_hash(base_url):
-    """Generate a short hash of the host URL for unique identification."""
-    return hashlib.md5(base_url.encode()).hexdigest()[:8]
+SENSOR_TYPES = (
+    "status",
+    "cpu_usage",
+    "memory_usage",
+    "uptime",
+    "image",
+    "current_version",
+    "available_version",
+)
+
+_STATUS_ICONS = {
+    "running": "mdi:docker",
+    "exited": "mdi:close-circle",
+    "paused": "mdi:pause-circle",
+}
 
 async def async_setup_entry(hass, entry, async_add_entities):
-    config = entry.data
-    host = config["host"]
-    username = config.get("username")
-    password = config.get("password")
-    api_key = config.get("api_key")
-    endpoint_id = config["endpoint_id"]
     entry_id = entry.entry_id
+    coordinator = hass.data[DOMAIN][entry_id]["coordinator"]
 
-    _LOGGER.info("🚀 Setting up HA Portainer Link sensors for entry %s (endpoint %s)", entry_id, endpoint_id)
-    _LOGGER.info("📍 Portainer host: %s", host)
-    
-    # Log the extracted host name for debugging
-    host_display_name = _get_host_display_name(host)
-    _LOGGER.info("🏷️ Extracted host display name: %s", host_display_name)
+    _LOGGER.debug("🚀 Setting up HA Portainer Link sensors for entry %s (endpoint %s)", entry_id, coordinator.endpoint_id)
+    _LOGGER.debug("📍 Portainer host: %s", coordinator.api.base_url)
 
-    api = PortainerAPI(host, username, password, api_key)
-    await api.initialize()
-    containers = await api.get_containers(endpoint_id)
+    # Migrate existing entities to stable unique_ids to avoid breaking automations
+    async_migrate_unique_ids(hass, coordinator, entry_id, "sensor", SENSOR_TYPES)
 
-    _LOGGER.info("📦 Found %d containers to process", len(containers))
+    # Resolve which sensor classes are enabled once, not per container
+    sensor_classes = [ContainerStatusSensor]
+    if coordinator.is_resource_sensors_enabled():
+        sensor_classes += [ContainerCPUSensor, ContainerMemorySensor, ContainerUptimeSensor]
+    sensor_classes.append(ContainerImageSensor)
+    if coordinator.is_version_sensors_enabled():
+        sensor_classes += [ContainerCurrentVersionSensor, ContainerAvailableVersionSensor]
 
     entities = []
     stack_containers_count = 0
     standalone_containers_count = 0
 
-    # Migrate existing entities to stable unique_ids to avoid breaking automations
-    try:
-        er_registry = er.async_get(hass)
-        for container in containers:
-            name = container.get("Names", ["unknown"])[0].strip("/")
-            container_id = container["Id"]
-            container_info = await api.inspect_container(endpoint_id, container_id)
-            stack_info = api.get_container_stack_info(container_info) if container_info else {"is_stack_container": False}
-            # Old unique_id suffixes and new stable mapping
-            suffixes = [
-                ("status", "sensor"),
-                ("cpu_usage", "sensor"),
-                ("memory_usage", "sensor"),
-                ("uptime", "sensor"),
-                ("image", "sensor"),
-                ("current_version", "sensor"),
-                ("available_version", "sensor"),
-            ]
-            for suffix, domain_name in suffixes:
-                old_uid = f"entry_{entry_id}_endpoint_{endpoint_id}_{container_id}_{suffix}"
-                new_uid = _build_stable_unique_id(entry_id, endpoint_id, name, stack_info, suffix)
-                if old_uid == new_uid:
-                    continue
-                ent_id = er_registry.async_get_entity_id(domain_name, DOMAIN, old_uid)
-                if ent_id:
-                    try:
-                        er_registry.async_update_entity(ent_id, new_unique_id=new_uid)
-                        _LOGGER.debug("Migrated %s unique_id: %s -> %s", ent_id, old_uid, new_uid)
-                    except Exception as e:
-                        _LOGGER.debug("Could not migrate %s: %s", ent_id, e)
-    except Exception as e:
-        _LOGGER.debug("Entity registry migration skipped/failed: %s", e)
-    
-    for container in containers:
-        name = container.get("Names", ["unknown"])[0].strip("/")
-        container_id = container["Id"]
-        state = container.get("State", STATE_UNKNOWN)
-        
-        _LOGGER.debug("🔍 Processing container: %s (ID: %s, State: %s)", name, container_id, state)
-        
-        # Get container inspection data to determine if it's part of a stack
-        container_info = await api.inspect_container(endpoint_id, container_id)
-        stack_info = api.get_container_stack_info(container_info) if container_info else {"is_stack_container": False}
-        
+    for container in coordinator.container_list:
+        container_id = container.id
+        container_name = container.name
+        stack_info = container.stack_info
+
         if stack_info.get("is_stack_container"):
             stack_containers_count += 1
-            _LOGGER.info("📋 Container %s is part of stack: %s", name, stack_info.get("stack_name"))
         else:
             standalone_containers_count += 1
-            _LOGGER.info("📦 Container %s is standalone", name)
 
         # Create sensors for all containers - they will all belong to the same stack device if they're in a stack
-        entities.append(ContainerStatusSensor(name, state, api, endpoint_id, container_id, stack_info, entry_id))
-        entities.append(ContainerCPUSensor(name, api, endpoint_id, container_id, stack_info, entry_id))
-        entities.append(ContainerMemorySensor(name, api, endpoint_id, container_id, stack_info, entry_id))
-        entities.append(ContainerUptimeSensor(name, api, endpoint_id, container_id, stack_info, entry_id))
-        entities.append(ContainerImageSensor(name, container, api, endpoint_id, container_id, stack_info, entry_id))
-        entities.append(ContainerCurrentVersionSensor(name, api, endpoint_id, container_id, stack_info, entry_id))
-        entities.append(ContainerAvailableVersionSensor(name, api, endpoint_id, container_id, stack_info, entry_id))
-
-    _LOGGER.info("✅ Created %d entities (%d stack containers, %d standalone containers)", 
+        entities.extend(
+            sensor_class(coordinator, entry_id, container_id, container_name, stack_info, container.stable_id)
+            for sensor_class in sensor_classes
+        )
+
+    _LOGGER.debug("✅ Created %d entities (%d stack containers, %d standalone containers)",
                 len(entities), stack_containers_count, standalone_containers_count)
 
-    async_add_entities(entities, update_before_add=True)
-
-class BaseContainerSensor(Entity):
-    """Base class for all container sensors."""
-
-    def __init__(self, container_name, container_id, api, endpoint_id, stack_info, entry_id):
-        self._container_name = container_name
-        self._container_id = container_id
-        self._api = api
-        self._endpoint_id = endpoint_id
-        self._stack_info = stack_info
-        self._entry_id = entry_id
-
-    async def _find_current_container_id(self):
-        """Try to find the current container ID after recreation by matching stack labels or name."""
-        try:
-            containers = await self._api.get_containers(self._endpoint_id)
-            if not containers:
-                return None
-
-            # Prefer stack label match for stack containers
-            if self._stack_info.get("is_stack_container"):
-                expected_stack = self._stack_info.get("stack_name")
-                expected_service = self._stack_info.get("service_name")
-                for container in containers:
-                    labels = container.get("Labels", {}) or {}
-                    if (
-                        labels.get("com.docker.compose.project") == expected_stack
-                        and labels.get("com.docker.compose.service") == expected_service
-                    ):
-                        return container.get("Id")
-
-            # Fallback: match by container name
-            for container in containers:
-                names = container.get("Names", []) or []
-                if not names:
-                    continue
-                name = names[0].strip("/")
-                if name == self._container_name:
-                    return container.get("Id")
-        except Exception:
-            return None
-        return None
-
-    async def _ensure_container_bound(self) -> None:
-        """Ensure self._container_id points to an existing container; rebind if necessary."""
-        try:
-            info = await self._api.get_container_info(self._endpoint_id, self._container_id)
-            # If info is empty or missing expected fields, try to rebind
-            if not info or not isinstance(info, dict) or not info.get("Id"):
-                new_id = await self._find_current_container_id()
-                if new_id and new_id != self._container_id:
-                    self._container_id = new_id
-        except Exception:
-            # On any error, try to rebind once
-            new_id = await self._find_current_container_id()
-            if new_id and new_id != self._container_id:
-                self._container_id = new_id
+    async_add_entities(entities)
 
-    @property
-    def device_info(self):
-        host_name = _get_host_display_name(self._api.base_url)
-        host_hash = _get_host_hash(self._api.base_url)
-        
-        if self._stack_info.get("is_stack_container"):
-            # For stack containers, use the stack as the device
-            stack_name = self._stack_info.get("stack_name", "unknown_stack")
-            # Use a more robust identifier that includes the entry_id, host hash, and host name to prevent duplicates
-            device_id = f"entry_{self._entry_id}_endpoint_{self._endpoint_id}_stack_{stack_name}_{host_hash}_{host_name.replace('.', '_').replace(':', '_')}"
-            _LOGGER.debug("🏗️ Creating stack device: %s (ID: %s) for host: %s (entry: %s, endpoint: %s, hash: %s)", 
-                         stack_name, device_id, host_name, self._entry_id, self._endpoint_id, host_hash)
-            return {
-                "identifiers": {(DOMAIN, device_id)},
-                "name": f"Stack: {stack_name} ({host_name})",
-                "manufacturer": "Docker via Portainer",
-                "model": "Docker Stack",
-                "configuration_url": f"{self._api.base_url}/#!/stacks/{stack_name}",
-            }
-        else:
-            # For standalone containers, use the container as the device
-            device_id = f"entry_{self._entry_id}_endpoint_{self._endpoint_id}_container_{self._container_id}_{host_hash}_{host_name.replace('.', '_').replace(':', '_')}"
-            _LOGGER.debug("🏗️ Creating standalone container device: %s (ID: %s) for host: %s (entry: %s, endpoint: %s, hash: %s)", 
-                         self._container_name, device_id, host_name, self._entry_id, self._endpoint_id, host_hash)
-            return {
-                "identifiers": {(DOMAIN, device_id)},
-                "name": f"{self._container_name} ({host_name})",
-                "manufacturer": "Docker via Portainer",
-                "model": "Docker Container",
-                "configuration_url": f"{self._api.base_url}/#!/containers/{self._container_id}/details",
-            }
-
-class ContainerStatusSensor(BaseContainerSensor):
+class ContainerStatusSensor(BaseContainerEntity, SensorEntity):
     """Sensor representing the status of a Docker container."""
 
-    def __init__(self, name, state, api, endpoint_id, container_id, stack_info, entry_id):
-        super().__init__(name, container_id, api, endpoint_id, stack_info, entry_id)
-        self._attr_name = f"{name} Status"
-        self._attr_unique_id = _build_stable_unique_id(entry_id, endpoint_id, name, stack_info, "status")
-        self._state = state
+    entity_type: ClassVar[str] = "status"
 
-    @property
-    def state(self):
-        return self._state or STATE_UNKNOWN
+    def __init__(self, coordinator, entry_id, container_id, container_name, stack_info, stable_id=None):
+        super().__init__(coordinator, entry_id, container_id, container_name, stack_info, stable_id)
+        self._attr_name = f"{self._get_container_name_display()} Status"
 
     @property
-    def icon(self):
-        return {
-            "running": "mdi:docker",
-            "exited": "mdi:close-circle",
-            "paused": "mdi:pause-circle",
-        }.get(self._state, "mdi:help-circle")
-
-    async def async_update(self):
-        """Update the container status."""
-        try:
-            await self._ensure_container_bound()
-            container_info = await self._api.get_container_info(self._endpoint_id, self._container_id)
-            if container_info:
-                self._state = container_info.get("State", {}).get("Status", STATE_UNKNOWN)
-            else:
-                self._state = STATE_UNKNOWN
-        except Exception as e:
-            _LOGGER.warning("Failed to get status for %s: %s", self._attr_name, e)
-            self._state = STATE_UNKNOWN
-
-class ContainerCPUSensor(BaseContainerSensor):
+    def native_value(self):
+        container_data = self._get_container_data()
+        if not container_data:
+            return STATE_UNKNOWN
+        state = container_data.get("State")
+        if isinstance(state, dict):
+            state = state.get("Status")
+        return state or STATE_UNKNOWN
+
+    def _update_from_coordinator(self) -> None:
+        """Pick the icon only when the container state is refreshed."""
+        self._attr_icon = _STATUS_ICONS.get(self.native_value, "mdi:help-circle")
+
+class ContainerCPUSensor(BaseContainerEntity, SensorEntity):
     """Sensor representing CPU usage of a Docker container."""
 
-    def __init__(self, name, api, endpoint_id, container_id, stack_info, entry_id):
-        super().__init__(name, container_id, api, endpoint_id, stack_info, entry_id)
-        self._attr_name = f"{name} CPU Usage"
-        self._attr_unique_id = _build_stable_unique_id(entry_id, endpoint_id, name, stack_info, "cpu_usage")
-        self._state = STATE_UNKNOWN
+    entity_type: ClassVar[str] = "cpu_usage"
+    _attr_icon = "mdi:cpu-64-bit"
+    _attr_native_unit_of_measurement = "%"
 
-    @property
-    def state(self):
-        return self._state
+    def __init__(self, coordinator, entry_id, container_id, container_name, stack_info, stable_id=None):
+        super().__init__(coordinator, entry_id, container_id, container_name, stack_info, stable_id)
+        self._attr_name = f"{self._get_container_name_display()} CPU Usage"
 
     @property
-    def unit_of_measurement(self):
-        return "%"
+    def native_value(self):
+        return self.coordinator.metrics.get(self.container_id, {}).get("cpu_percent")
 
-    @property
-    def icon(self):
-        return "mdi:cpu-64-bit"
-
-    async def async_update(self):
-        await self._ensure_container_bound()
-        stats = await self._api.get_container_stats(self._endpoint_id, self._container_id)
-        try:
-            cpu_usage = stats["cpu_stats"]["cpu_usage"]["total_usage"]
-            precpu_usage = stats["precpu_stats"]["cpu_usage"]["total_usage"]
-            system_cpu = stats["cpu_stats"]["system_cpu_usage"]
-            pre_system_cpu = stats["precpu_stats"]["system_cpu_usage"]
-
-            cpu_delta = cpu_usage - precpu_usage
-            system_delta = system_cpu - pre_system_cpu
-            cpu_count = stats.get("cpu_stats", {}).get("online_cpus", 1)
-
-            usage = (cpu_delta / system_delta) * cpu_count * 100.0 if system_delta > 0 else 0
-            self._state = round(usage, 2)
-        except Exception as e:
-            _LOGGER.warning("Failed to parse CPU stats for %s: %s", self._attr_name, e)
-            self._state = STATE_UNKNOWN
-
-class ContainerMemorySensor(BaseContainerSensor):
+class ContainerMemorySensor(BaseContainerEntity, SensorEntity):
     """Sensor representing memory usage of a Docker container."""
 
-    def __init__(self, name, api, endpoint_id, container_id, stack_info, entry_id):
-        super().__init__(name, container_id, api, endpoint_id, stack_info, entry_id)
-        self._attr_name = f"{name} Memory Usage"
-        self._attr_unique_id = _build_stable_unique_id(entry_id, endpoint_id, name, stack_info, "memory_usage")
-        self._state = STATE_UNKNOWN
+    entity_type: ClassVar[str] = "memory_usage"
+    _attr_icon = "mdi:memory"
+    _attr_native_unit_of_measurement = "MB"
 
-    @property
-    def state(self):
-        return self._state
+    def __init__(self, coordinator, entry_id, container_id, container_name, stack_info, stable_id=None):
+        super().__init__(coordinator, entry_id, container_id, container_name, stack_info, stable_id)
+        self._attr_name = f"{self._get_container_name_display()} Memory Usage"
 
     @property
-    def unit_of_measurement(self):
-        return "MB"
+    def native_value(self):
+        return self.coordinator.metrics.get(self.container_id, {}).get("memory_mb")
 
-    @property
-    def icon(self):
-        return "mdi:memory"
-
-    async def async_update(self):
-        await self._ensure_container_bound()
-        stats = await self._api.get_container_stats(self._endpoint_id, self._container_id)
-        try:
-            mem_bytes = stats["memory_stats"]["usage"]
-            self._state = round(mem_bytes / (1024 * 1024), 2)
-        except Exception as e:
-            _LOGGER.warning("Failed to parse memory stats for %s: %s", self._attr_name, e)
-            self._state = STATE_UNKNOWN
-
-class ContainerUptimeSensor(BaseContainerSensor):
+class ContainerUptimeSensor(BaseContainerEntity, SensorEntity):
     """Sensor representing uptime of a Docker container."""
 
-    def __init__(self, name, api, endpoint_id, container_id, stack_info, entry_id):
-        super().__init__(name, container_id, api, endpoint_id, stack_info, entry_id)
-        self._attr_name = f"{name} Uptime"
-        self._attr_unique_id = _build_stable_unique_id(entry_id, endpoint_id, name, stack_info, "uptime")
-        self._state = STATE_UNKNOWN
-
-    @property
-    def state(self):
-        return self._state
-
-    @property
-    def icon(self):
-        return "mdi:clock-outline"
-
-    async def async_update(self):
-        await self._ensure_container_bound()
-        container_info = await self._api.get_container_info(self._endpoint_id, self._container_id)
-        try:
-            started_at = container_info["State"]["StartedAt"]
-            if started_at and started_at != "0001-01-01T00:00:00Z":
-                # Convert ISO timestamp to human readable format
-                from datetime import datetime
-                try:
-                    dt = datetime.fromisoformat(started_at.replace('Z', '+00:00'))
-                    # Format as relative time (e.g., "2 days ago")
-                    from datetime import timezone
-                    now = datetime.now(timezone.utc)
-                    diff = now - dt.replace(tzinfo=timezone.utc)
-                    
-                    if diff.days > 0:
-                        self._state = f"{diff.days} days ago"
-                    elif diff.seconds > 3600:
-                        hours = diff.seconds // 3600
-                        self._state = f"{hours} hours ago"
-                    elif diff.seconds > 60:
-                        minutes = diff.seconds // 60
-                        self._state = f"{minutes} minutes ago"
-                    else:
-                        self._state = "Just started"
-                except:
-                    # Fallback to original format if parsing fails
-                    self._state = started_at
-            else:
-                self._state = "Not started"
-        except Exception as e:
-            _LOGGER.warning("Failed to get uptime for %s: %s", self._attr_name, e)
-            self._state = STATE_UNKNOWN
-
-class ContainerImageSensor(BaseContainerSensor):
+    entity_type: ClassVar[str] = "uptime"
+    _attr_icon = "mdi:clock-outline"
+
+    def __init__(self, coordinator, entry_id, container_id, container_name, stack_info, stable_id=None):
+        super().__init__(coordinator, entry_id, container_id, container_name, stack_info, stable_id)
+        self._attr_name = f"{self._get_container_name_display()} Uptime"
+
+    @property
+    def native_value(self):
+        uptime_s = self.coordinator.metrics.get(self.container_id, {}).get("uptime_s")
+        if uptime_s is None:
+            return "Not started"
+        # Format as relative time (e.g., "2 days ago")
+        days, seconds = divmod(uptime_s, 86400)
+        if days > 0:
+            return f"{days} days ago"
+        if seconds > 3600:
+            return f"{seconds // 3600} hours ago"
+        if seconds > 60:
+            return f"{seconds // 60} minutes ago"
+        return "Just started"
+
+class ContainerImageSensor(BaseContainerEntity, SensorEntity):
     """Sensor representing Docker image of a container."""
 
-    def __init__(self, name, container_data, api, endpoint_id, container_id, stack_info, entry_id):
-        super().__init__(name, container_id, api, endpoint_id, stack_info, entry_id)
-        self._attr_name = f"{name} Image"
-        self._attr_unique_id = _build_stable_unique_id(entry_id, endpoint_id, name, stack_info, "image")
-        self._state = container_data.get("Image", STATE_UNKNOWN)
+    entity_type: ClassVar[str] = "image"
+    _attr_icon = "mdi:docker"
 
-    @property
-    def state(self):
-        return self._state
+    def __init__(self, coordinator, entry_id, container_id, container_name, stack_info, stable_id=None):
+        super().__init__(coordinator, entry_id, container_id, container_name, stack_info, stable_id)
+        self._attr_name = f"{self._get_container_name_display()} Image"
 
     @property
-    def icon(self):
-        return "mdi:docker"
-
-    async def async_update(self):
-        """Update the container image information."""
-        try:
-            await self._ensure_container_bound()
-            container_info = await self._api.get_container_info(self._endpoint_id, self._container_id)
-            if container_info:
-                self._state = container_info.get("Config", {}).get("Image", STATE_UNKNOWN)
-            else:
-                self._state = STATE_UNKNOWN
-        except Exception as e:
-            _LOGGER.warning("Failed to get image for %s: %s", self._attr_name, e)
-            self._state = STATE_UNKNOWN
-
-
-class ContainerCurrentVersionSensor(BaseContainerSensor):
+    def native_value(self):
+        container_data = self._get_container_data()
+        if not container_data:
+            return STATE_UNKNOWN
+        image_name = self.coordinator.image_data.get(self.container_id, {}).get("image_name")
+        return image_name or container_data.get("Image", STATE_UNKNOWN)
+
+class ContainerCurrentVersionSensor(BaseContainerEntity, SensorEntity):
     """Sensor representing the current version of a Docker container."""
 
-    def __init__(self, name, api, endpoint_id, container_id, stack_info, entry_id):
-        super().__init__(name, container_id, api, endpoint_id, stack_info, entry_id)
-        self._attr_name = f"{name} Current Version"
-        self._attr_unique_id = _build_stable_unique_id(entry_id, endpoint_id, name, stack_info, "current_version")
-        self._state = STATE_UNKNOWN
+    entity_type: ClassVar[str] = "current_version"
+    _attr_icon = "mdi:tag-text"
 
-    @property
-    def state(self):
-        return self._state
+    def __init__(self, coordinator, entry_id, container_id, container_name, stack_info, stable_id=None):
+        super().__init__(coordinator, entry_id, container_id, container_name, stack_info, stable_id)
+        self._attr_name = f"{self._get_container_name_display()} Current Version"
 
     @property
-    def icon(self):
-        return "mdi:tag-text"
-
-    async def async_update(self):
-        try:
-            await self._ensure_container_bound()
-            container_info = await self._api.get_container_info(self._endpoint_id, self._container_id)
-            if container_info:
-                image_id = container_info.get("Image")
-                if image_id:
-                    # Get image details to extract version info
-                    image_data = await self._api.get_image_info(self._endpoint_id, image_id)
-                    if image_data:
-                        version = self._api.extract_version_from_image(image_data)
-                        self._state = version
-                    else:
-                        self._state = STATE_UNKNOWN
-                else:
-                    self._state = STATE_UNKNOWN
-            else:
-                self._state = STATE_UNKNOWN
-        except Exception as e:
-            _LOGGER.warning("Failed to get current version for %s: %s", self._attr_name, e)
-            self._state = STATE_UNKNOWN
-
-
-class ContainerAvailableVersionSensor(BaseContainerSensor):
+    def native_value(self):
+        return self.coordinator.image_data.get(self.container_id, {}).get("current_version", STATE_UNKNOWN)
+
+class ContainerAvailableVersionSensor(BaseContainerEntity, SensorEntity):
     """Sensor representing the available version of a Docker container."""
 
-    def __init__(self, name, api, endpoint_id, container_id, stack_info, entry_id):
-        super().__init__(name, container_id, api, endpoint_id, stack_info, entry_id)
-        self._attr_name = f"{name} Available Version"
-        self._attr_unique_id = _build_stable_unique_id(entry_id, endpoint_id, name, stack_info, "available_version")
-        self._state = STATE_UNKNOWN
+    entity_type: ClassVar[str] = "available_version"
+    _attr_icon = "mdi:tag-plus"
 
-    @property
-    def state(self):
-        return self._state
+    def __init__(self, coordinator, entry_id, container_id, container_name, stack_info, stable_id=None):
+        super().__init__(coordinator, entry_id, container_id, container_name, stack_info, stable_id)
+        self._attr_name = f"{self._get_container_name_display()} Available Version"
 
     @property
-    def icon(self):
-        return "mdi:tag-plus"
-
-    async def async_update(self):
-        try:
-            await self._ensure_container_bound()
-            container_info = await self._api.get_container_info(self._endpoint_id, self._container_id)
-            if container_info:
-                image_name = container_info.get("Config", {}).get("Image")
-                if image_name:
-                    # Get available version from registry
-                    available_version = await self._api.get_available_version(self._endpoint_id, image_name)
-                    self._state = available_version
-                else:
-                    self._state = STATE_UNKNOWN
-            else:
-                self._state = STATE_UNKNOWN
-        except Exception as e:
-            _LOGGER.warning("Failed to get available version for %s: %s", self._attr_name, e)
-            self._state = STATE_UNKNOWN
\ No newline at end of file
+    def native_value(self):
+        return self.coordinator.image_data.get(self.container_id, {}).get("available_version", STATE_UNKNOWN)
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.helpers.debounce import Debouncer
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_RELOAD = "reload"
+SERVICE_REFRESH = "refresh"
+
+# Repeated reload calls within this window are coalesced into a single reload
+RELOAD_COOLDOWN = 10
+
+async def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services once per Home Assistant instance."""
+    if hass.services.has_service(DOMAIN, SERVICE_RELOAD) and hass.services.has_service(DOMAIN, SERVICE_REFRESH):
+        return
+
+    async def _async_reload_entries() -> None:
+        """Reload every HA Portainer Link config entry."""
+        entries = hass.config_entries.async_entries(DOMAIN)
+        if not entries:
+            return
+        _LOGGER.info("🔄 Reloading %d Portainer entries", len(entries))
+        results = await asyncio.gather(
+            *(hass.config_entries.async_reload(entry.entry_id) for entry in entries),
+            return_exceptions=True,
+        )
+        for entry, result in zip(entries, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("❌ Failed to reload Portainer entry %s: %s", entry.entry_id, result)
+
+    reload_debouncer = Debouncer(
+        hass, _LOGGER, cooldown=RELOAD_COOLDOWN, immediate=True, function=_async_reload_entries
+    )
+
+    async def reload_portainer_integration(call: ServiceCall) -> None:
+        """Reload all entries, coalescing bursts of calls."""
+        await reload_debouncer.async_call()
+
+    async def refresh_container_data(call: ServiceCall) -> None:
+        """Request a coordinator refresh for every HA Portainer Link config entry."""
+        domain_data = hass.data.get(DOMAIN)
+        if not domain_data:
+            return
+        coordinators = []
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            entry_data = domain_data.get(entry.entry_id)
+            if entry_data is None:
+                _LOGGER.warning("⚠️ No coordinator found for entry %s", entry.entry_id)
+                continue
+            coordinators.append(entry_data["coordinator"])
+        await asyncio.gather(*(coordinator.async_request_refresh() for coordinator in coordinators))
+
+    if not hass.services.has_service(DOMAIN, SERVICE_RELOAD):
+        hass.services.async_register(DOMAIN, SERVICE_RELOAD, reload_portainer_integration)
+    if not hass.services.has_service(DOMAIN, SERVICE_REFRESH):
+        hass.services.async_register(DOMAIN, SERVICE_REFRESH, refresh_container_data)
@@ -6,6 +6,9 @@ from typing import List, Dict, Any, Optional, Tuple
 
 import aiohttp
 from aiohttp.client_exceptions import ClientConnectorCertificateError
+from homeassistant.util.json import json_loads
+
+from .const import STACK_ACTION_CONCURRENCY
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -49,7 +52,7 @@ class PortainerStackAPI:
             if resp.status != 200:
                 _LOGGER.error("❌ Could not list stacks: HTTP %s", resp.status)
                 return None
-            stacks: List[Dict[str, Any]] = await resp.json()
+            stacks: List[Dict[str, Any]] = await resp.json(loads=json_loads)
             for st in stacks:
                 if st.get("EndpointId") == endpoint_id and st.get("Name") == stack_name:
                     return st
@@ -61,7 +64,7 @@ class PortainerStackAPI:
             if resp.status != 200:
                 _LOGGER.error("❌ Could not fetch stack %s details: HTTP %s", stack_id, resp.status)
                 return None
-            return await resp.json()
+            return await resp.json(loads=json_loads)
 
     async def _list_stack_container_ids(self, endpoint_id: int, stack_name: str) -> List[str]:
         url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/json?all=1"
@@ -69,7 +72,7 @@ class PortainerStackAPI:
             if resp.status != 200:
                 _LOGGER.error("❌ Could not list containers: HTTP %s", resp.status)
                 return []
-            data: List[Dict[str, Any]] = await resp.json()
+            data: List[Dict[str, Any]] = await resp.json(loads=json_loads)
             ids: List[str] = []
             for c in data:
                 # Portainer/Docker compose labels
@@ -87,7 +90,7 @@ class PortainerStackAPI:
             if resp.status != 200:
                 _LOGGER.error("❌ Could not get stacks list: HTTP %s", resp.status)
                 return []
-            stacks = await resp.json()
+            stacks = await resp.json(loads=json_loads)
             return [s for s in stacks if s.get("EndpointId") == endpoint_id]
 
     async def stop_stack(self, endpoint_id: int, stack_name: str) -> bool:
@@ -95,14 +98,22 @@ class PortainerStackAPI:
         if not ids:
             _LOGGER.info("ℹ️ No containers found for stack %s (may be fresh stack)", stack_name)
             return True  # Consider this success for fresh stacks
-        ok = 0
-        for cid in ids:
+        sem = asyncio.Semaphore(STACK_ACTION_CONCURRENCY)
+
+        async def _stop(cid: str) -> bool:
             url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/{cid}/stop"
-            async with await self._request("POST", url) as resp:
+            async with sem, await self._request("POST", url) as resp:
                 if resp.status == 204:
-                    ok += 1
-                else:
-                    _LOGGER.warning("⚠️ Failed to stop %s: HTTP %s", cid, resp.status)
+                    return True
+                _LOGGER.warning("⚠️ Failed to stop %s: HTTP %s", cid, resp.status)
+                return False
+
+        # Stop stack containers concurrently (bounded) rather than one round-trip after another
+        results = await asyncio.gather(*(_stop(cid) for cid in ids), return_exceptions=True)
+        for cid, result in zip(ids, results):
+            if isinstance(result, Exception):
+                _LOGGER.warning("⚠️ Error stopping %s: %s", cid, result)
+        ok = sum(result is True for result in results)
         _LOGGER.info("🛑 Stopped %d/%d containers in stack %s", ok, len(ids), stack_name)
         return ok == len(ids)
 
@@ -169,7 +180,10 @@ class PortainerStackAPI:
             _LOGGER.error("❌ Could not get stack detail for %s (ID: %s)", stack_name, stack_id)
             return result
 
-        _LOGGER.debug("🔍 Stack detail keys: %s", list(detail.keys()) if detail else "None")
+        # Resolve the log level once; some debug lines below build lists just to be logged
+        debug_enabled = _LOGGER.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            _LOGGER.debug("🔍 Stack detail keys: %s", list(detail))
 
         # Try multiple sources for compose content
         compose = ""
@@ -195,7 +209,7 @@ class PortainerStackAPI:
                 file_url = f"{self.base_url}/api/stacks/{stack_id}/file?endpointId={endpoint_id}"
                 async with await self._request("GET", file_url) as resp:
                     if resp.status == 200:
-                        file_data = await resp.json()
+                        file_data = await resp.json(loads=json_loads)
                         compose = file_data.get("StackFileContent", "").strip()
                         _LOGGER.debug("🔍 From file endpoint - compose length: %d", len(compose))
                     else:
@@ -249,7 +263,8 @@ class PortainerStackAPI:
             "stackFileContent": compose,
         }
         _LOGGER.debug("🔍 Updating stack %s with URL: %s", stack_name, put_url)
-        _LOGGER.debug("🔍 Update payload keys: %s", list(payload.keys()))
+        if debug_enabled:
+            _LOGGER.debug("🔍 Update payload keys: %s", list(payload))
         async with await self._request("PUT", put_url, json=payload) as resp:
             ok = resp.status == 200
             body = None
@@ -268,7 +283,6 @@ class PortainerStackAPI:
                     _LOGGER.error("❌ Fallback start also failed for stack %s", stack_name)
                     # Try one more time with a delay
                     _LOGGER.info("🔄 Trying one more time with delay for stack %s", stack_name)
-                    import asyncio
                     await asyncio.sleep(5)
                     started = await self.start_stack(endpoint_id, stack_name)
                     result["started"] = started
@@ -299,29 +313,26 @@ class PortainerStackAPI:
         Uses two lists: expected containers (all=1) filtered by stack label, and running (all=0).
         Success requires expected_count > 0 and running_count == expected_count.
         """
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         deadline = loop.time() + timeout
+        running_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/json?all=0"
         while loop.time() < deadline:
             # Determine expected containers for this stack
             expected_ids = await self._list_stack_container_ids(endpoint_id, stack_name)
-            if not expected_ids:
-                await asyncio.sleep(interval)
-                continue
-
-            # Get currently running containers and count how many belong to the stack
-            running_url = f"{self.base_url}/api/endpoints/{endpoint_id}/docker/containers/json?all=0"
-            async with await self._request("GET", running_url) as resp:
-                if resp.status != 200:
-                    await asyncio.sleep(interval)
-                    continue
-                running_data: List[Dict[str, Any]] = await resp.json()
-                running_count = 0
-                for c in running_data:
-                    labels = c.get("Labels", {}) or {}
-                    if labels.get("com.docker.compose.project") == stack_name:
-                        running_count += 1
-                if running_count == len(expected_ids) and running_count > 0:
-                    return True
+            if expected_ids:
+                # Get currently running containers and count how many belong to the stack;
+                # the response is released before sleeping so the connection isn't held idle
+                running_data: Optional[List[Dict[str, Any]]] = None
+                async with await self._request("GET", running_url) as resp:
+                    if resp.status == 200:
+                        running_data = await resp.json(loads=json_loads)
+                if running_data is not None:
+                    running_count = sum(
+                        (c.get("Labels") or {}).get("com.docker.compose.project") == stack_name
+                        for c in running_data
+                    )
+                    if running_count == len(expected_ids):
+                        return True
 
             await asyncio.sleep(interval)
         return False